@@ -11,9 +11,10 @@ from inspect import isawaitable
 from alita.datastructures import ImmutableDict
 from alita.config import Config, ConfigAttribute
 from alita.factory import AppFactory
-from alita.helpers import import_string, cached_property, method_dispatch
+from alita.helpers import import_string, cached_property, method_dispatch, \
+    is_coroutine_callable
 from alita.response import TextResponse, JsonResponse
-from alita.exceptions import ServerError, WebSocketConnectionClosed
+from alita.exceptions import ServerError, ServiceUnavailable, WebSocketConnectionClosed
 from alita.handler import IGNORE_EXCEPTIONS
 from collections import UserDict
 from alita.templating import Environment
@@ -71,6 +72,9 @@ class Alita(object):
         'JSON_SORT_KEYS': True,
         'JSONIFY_PRETTYPRINT_REGULAR': False,
         'JSONIFY_MIMETYPE': 'application/json',
+        'JSON_PROVIDER_CLASS': None,
+        'ROUTE_CACHE_SIZE': 0,
+        'URL_FOR_CACHE': False,
         'TEMPLATES_AUTO_RELOAD': False,
         'MAX_COOKIE_SIZE': 4093,
         'SESSION_SAVE_EVERY_REQUEST': False,
@@ -83,7 +87,33 @@ class Alita(object):
         'HTTP_HOST': 'http_host',
         'REAL_IP_HEADER': 'x-real-ip',
         'REMOTE_ADDR': 'remote_addr',
-        'STRICT_SLASHES': True
+        'STRICT_SLASHES': True,
+        'RESPONSE_CACHE_BACKEND': 'alita.cache.MemoryCacheBackend',
+        'RESPONSE_CACHE_DEFAULT_TTL': 300,
+        'RESPONSE_CACHE_MAX_ENTRIES': 1024,
+        'RESPONSE_CACHE_MAX_BYTES': 64 * 1024 * 1024,
+        'RESPONSE_CACHE_DIR': None,
+        'STATIC_FILE_CACHE_TTL': 2,
+        'STATIC_FILE_CACHE_SIZE': 1024,
+        'COMPRESS_ENABLED': False,
+        'COMPRESS_ALGORITHMS': ('br', 'gzip'),
+        'COMPRESS_MIMETYPES': frozenset((
+            'text/html', 'text/css', 'text/plain', 'text/xml', 'text/csv',
+            'text/javascript', 'text/event-stream', 'application/json',
+            'application/javascript', 'application/xml', 'image/svg+xml',
+        )),
+        'COMPRESS_MIN_SIZE': 500,
+        'COMPRESS_LEVEL': 6,
+        'COMPRESS_BR_LEVEL': 4,
+        'COMPRESS_EXECUTOR_MIN_SIZE': 256 * 1024,
+        'COMPRESS_STATIC': False,
+        'WEBSOCKET_MAX_QUEUE': 256,
+        'WEBSOCKET_SLOW_CONSUMER': 'close',
+        'METRICS_ENABLED': False,
+        'METRICS_ROUTE': '/metrics',
+        'METRICS_BUCKETS': None,
+        'METRICS_MULTIPROC_DIR': None,
+        'METRICS_FLUSH_INTERVAL': 5,
     })
 
     def __init__(self, name=None, subdomain_matching=False, static_folder=None,
@@ -91,6 +121,7 @@ class Alita(object):
         self.name = name
         self.view_functions = {}
         self.view_functions_handlers = {}
+        self.stream_endpoints = set()
         self.static_folder = static_folder
         self.static_url_path = static_url_path
         self.template_folder = template_folder
@@ -111,14 +142,23 @@ class Alita(object):
         self.template_context_processors = {
             None: [self._default_template_ctx_processor]
         }
+        self._compiled_hooks = {}
         self.app_factory_class = import_string(self.config.get(
             "APP_FACTORY_CLASS", self._default_factory_class))
         self.app_factory = self.app_factory_class(self)
         self.exception_handler = None
         self.static_handler = None
         self.router = None
+        self.response_cache = None
+        self.compressor = None
+        self.json = None
+        self.session_interface = None
+        self.broadcaster = None
+        self.metrics = None
+        self.server_state = None
         self.loop = None
         self.make_factory()
+        self.view_handler(self.response_cache.view_handler)
         self.websocket_tasks = set()
         self.websocket_handler_connections = {}
 
@@ -134,16 +174,53 @@ class Alita(object):
 
     def request_middleware(self, f):
         self.before_request_funcs.setdefault(None, []).append(f)
+        self.invalidate_hooks()
         return f
 
     def response_middleware(self, f):
         self.after_request_funcs.setdefault(None, []).append(f)
+        self.invalidate_hooks()
         return f
 
+    def invalidate_hooks(self):
+        """
+        Drop the compiled hook chains.  Registration through the app and
+        blueprints does it already, call it after changing
+        ``before_request_funcs``, ``after_request_funcs`` or
+        ``template_context_processors`` directly.
+        """
+        self._compiled_hooks.clear()
+
+    def get_hooks(self, registry, blueprint=None):
+        """
+        The app hooks of ``registry`` followed by the ones of ``blueprint``
+        as a tuple of ``(func, is_coroutine)``, compiled on first use.
+        """
+        key = (registry, blueprint)
+        try:
+            return self._compiled_hooks[key]
+        except KeyError:
+            pass
+        funcs = getattr(self, registry)
+        hooks = list(funcs.get(None, ()))
+        if blueprint is not None:
+            hooks.extend(funcs.get(blueprint, ()))
+        hooks = tuple((func, is_coroutine_callable(func)) for func in hooks)
+        self._compiled_hooks[key] = hooks
+        return hooks
+
     def view_handler(self, f):
         self.view_functions_handlers.setdefault(None, []).append(f)
         return f
 
+    def cache(self, ttl=None, vary=None):
+        """
+        Cache the serialized response of a GET/HEAD view for ``ttl``
+        seconds, keyed on method, host, path, query string and the
+        request headers named in ``vary``.
+        """
+        return self.response_cache.cached(ttl, vary)
+
     def make_config(self):
         defaults = dict(self.default_config)
         self.config = self.config_class(defaults)
@@ -165,6 +242,12 @@ class Alita(object):
         self.exception_class = self.app_factory.create_base_exception_class()
         self.exception_handler = self.app_factory.create_exception_handler_object()
         self.router = self.app_factory.create_router_object()
+        self.response_cache = self.app_factory.create_response_cache()
+        self.compressor = self.app_factory.create_compressor()
+        self.json = self.app_factory.create_json_provider()
+        self.session_interface = self.app_factory.create_session_interface()
+        self.broadcaster = self.app_factory.create_broadcaster()
+        self.metrics = self.app_factory.create_metrics()
         self.static_handler = self.app_factory.create_static_handler()
 
     def error_handler(self, code_or_exception):
@@ -186,7 +269,7 @@ class Alita(object):
     def get_endpoint_from_view_func(view_func):
         return view_func.__name__
 
-    def add_url_rule(self, view_func, rule, endpoint=None, methods=None, **options):
+    def add_url_rule(self, view_func, rule, endpoint=None, methods=None, stream=False, **options):
         if endpoint is None:
             endpoint = self.get_endpoint_from_view_func(view_func)
         if methods is None:
@@ -199,6 +282,8 @@ class Alita(object):
         self.check_view_functions(view_func, endpoint)
         self.router.add_route(rule, endpoint, view_func, methods)
         self.view_functions[endpoint] = view_func
+        if stream:
+            self.stream_endpoints.add(endpoint)
 
     def check_view_functions(self, view_func, endpoint):
         old_func = self.view_functions.get(endpoint)
@@ -223,8 +308,11 @@ class Alita(object):
             return f
         return decorator
 
-    def run(self, extra_files=None, auto_reload=None, reload_interval=1, **kwargs):
+    def run(self, extra_files=None, auto_reload=None, reload_interval=1, workers=1, **kwargs):
         def inner(loop=None):
+            if workers > 1:
+                Supervisor(self, workers, logger=self.logger, **kwargs).run()
+                return
             server = Server(self, config=ServerConfig(loop=loop, **kwargs))
             server.run()
 
@@ -236,13 +324,18 @@ class Alita(object):
         else:
             inner()
 
+    async def shutdown(self):
+        """
+        Called by the server after its connections are closed, before the
+        event loop is closed.
+        """
+        if self.session_interface is not None:
+            await self.session_interface.close()
+
     async def preprocess_request(self, request):
-        bp = request.blueprint
-        funcs = self.before_request_funcs.get(None, [])
-        if bp is not None and bp in self.before_request_funcs:
-            funcs = itertools.chain(funcs, self.before_request_funcs[bp])
-        for func in funcs:
-            rv = await self.get_awaitable_result(func, request)
+        for func, is_coroutine in self.get_hooks(
+                "before_request_funcs", request.blueprint):
+            rv = await func(request) if is_coroutine else func(request)
             if rv is not None:
                 return rv
 
@@ -274,11 +367,18 @@ class Alita(object):
 
     @make_response.register(dict)
     async def _(self, json_value):
-        return JsonResponse(json_value)
+        return self.jsonify(json_value)
 
     @make_response.register(list)
     async def _(self, json_value):
-        return JsonResponse(json_value)
+        return self.jsonify(json_value)
+
+    def jsonify(self, obj, status=200, headers=None):
+        """
+        Serialize ``obj`` with :attr:`json` into a :class:`JsonResponse`.
+        """
+        return JsonResponse(self.json.dumps(obj), status, headers,
+                            self.config.get('JSONIFY_MIMETYPE'))
 
     async def get_awaitable_result(self, func, *args, **kwargs):
         func_result = func(*args, **kwargs)
@@ -288,21 +388,29 @@ class Alita(object):
             return func_result
 
     async def process_response(self, request, response):
-        bp = request.blueprint
-        funcs = self.after_request_funcs.get(None, [])
-        if bp is not None and bp in self.after_request_funcs:
-            funcs = itertools.chain(funcs, self.after_request_funcs[bp])
-        for func in funcs:
-            response = await self.get_awaitable_result(func, request, response)
+        for func, is_coroutine in self.get_hooks(
+                "after_request_funcs", request.blueprint):
+            if is_coroutine:
+                response = await func(request, response)
+            else:
+                response = func(request, response)
         return response
 
     async def finalize_response(self, response):
         return response
 
     async def finalize_request(self, request, response, from_error_handler=False):
+        timer = request.timer
         response = await self.make_response(response)
+        if timer is not None:
+            timer.mark("serialization")
         try:
             response = await self.process_response(request, response)
+            if timer is not None:
+                timer.mark("middleware")
+            session = request.loaded_session
+            if session is not None:
+                await self.session_interface.save_session(request, response, session)
             signals.request_finished.send(self, response=response)
         except Exception as ex:
             if not from_error_handler:
@@ -312,11 +420,16 @@ class Alita(object):
         return response
 
     async def full_dispatch_request(self, request):
+        timer = request.timer
         try:
             signals.request_started.send(self)
             response = await self.preprocess_request(request)
+            if timer is not None:
+                timer.mark("middleware")
             if response is None:
                 response = await self.dispatch_request(request)
+                if timer is not None:
+                    timer.mark("view")
             response = await self.finalize_request(request, response)
             return await self.finalize_response(response)
         except Exception as ex:
@@ -334,10 +447,31 @@ class Alita(object):
         return self.app_factory.create_request_object(environ)
 
     async def __call__(self, environ, on_response):
+        metrics = self.metrics
+        timer = metrics.create_timer() if metrics.enabled else None
         request, response = None, None
+        admission, endpoint = environ.admission, None
         try:
             request = await self.create_request(environ)
-            response = await self.full_dispatch_request(request)
+            if timer is not None:
+                request.timer = timer
+                timer.mark("routing")
+            if admission is not None and request.endpoint in admission.endpoint_limits:
+                if not await environ.protocol.acquire_endpoint(environ, request.endpoint):
+                    raise ServiceUnavailable(retry_after=admission.get_retry_after())
+                endpoint = request.endpoint
+            if timer is not None and request.path == metrics.path:
+                response = await metrics.handle(request)
+            else:
+                if request.routing_exception is None and not request.is_stream:
+                    await request.read_body()
+                    if timer is not None:
+                        timer.mark("body")
+                response = await self.full_dispatch_request(request)
+                if self.compressor.enabled:
+                    response = await self.compressor.compress(request, response)
+                    if timer is not None:
+                        timer.mark("serialization")
         except Exception as ex:
             try:
                 exception = await self.exception_handler.process_exception(request, ex)
@@ -345,10 +479,16 @@ class Alita(object):
                 response = None
             else:
                 response = await self.make_response(exception)
+        finally:
+            if endpoint is not None:
+                admission.release(endpoint)
         if not on_response:
             return response
         if response:
             await on_response(response)
+            if timer is not None:
+                timer.mark("output")
+                metrics.observe(request, response, timer)
         elif not self.is_websocket:
             message = "Caught handled exception, response object empty."
             self.logger.error(message)
@@ -373,13 +513,13 @@ class Alita(object):
             self.blueprints[blueprint.name] = blueprint
             self._blueprint_order.append(blueprint)
         blueprint.register(self, **options)
+        self.invalidate_hooks()
 
     def iter_blueprints(self):
         return iter(self._blueprint_order)
 
     def url_for(self, endpoint, **path_params):
-        url_path = self.router.url_path_for(endpoint, **path_params)
-        return url_path.make_url()
+        return self.router.url_for(endpoint, **path_params)
 
     def templates_auto_reload(self):
         r = self.config['TEMPLATES_AUTO_RELOAD']
@@ -425,6 +565,7 @@ class Alita(object):
 
     def context_processor(self, f):
         self.template_context_processors[None].append(f)
+        self.invalidate_hooks()
         return f
 
     def _default_template_ctx_processor(self, request):
@@ -461,6 +602,7 @@ class Alita(object):
             fut = asyncio.ensure_future(handler(request, ws, *args, **kwargs))
             self.websocket_tasks.add(fut)
             self.websocket_handler_connections.setdefault(endpoint, set()).add(ws)
+            self.broadcaster.register(ws, protocol, endpoint)
             try:
                 await fut
             except (asyncio.CancelledError, ConnectionClosed) as ex:
@@ -473,6 +615,7 @@ class Alita(object):
                     self.websocket_handler_connections[endpoint].remove(ws)
                 except KeyError:
                     pass
+                self.broadcaster.unregister(ws)
             await ws.close()
             raise WebSocketConnectionClosed
 
@@ -495,10 +638,8 @@ class Alita(object):
         return decorator
 
     async def send_websocket_message(self, endpoint, message):
-        if endpoint not in self.websocket_handler_connections:
-            return
-        for ws in self.websocket_handler_connections[endpoint]:
-            try:
-                await ws.send(message)
-            except Exception:
-                continue
+        """
+        Send ``message`` to every websocket connected to ``endpoint`` or
+        joined to the room ``endpoint``, return the number of deliveries.
+        """
+        return await self.broadcaster.broadcast(endpoint, message)
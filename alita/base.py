@@ -7,7 +7,63 @@ from multidict import CIMultiDict
 from alita.serve import STATUS_TEXT
 from alita.helpers import get_request_url
 from alita.helpers import cached_property, to_unicode, \
-    has_message_body, remove_entity_headers, parse_options_header
+    has_message_body, parse_options_header, _ENTITY_HEADERS
+
+# Entity headers dropped from 304 and 412 responses, RFC 2616 Section 10.3.5
+# keeps Content-Location and Expires as cache validators.
+_ENTITY_HEADER_NAMES = _ENTITY_HEADERS - {"content-location", "expires"}
+MAX_CACHED_HEADER_NAMES = 256
+_header_names = {}
+_status_lines = {}
+_keep_alive_headers = {}
+
+
+def get_status_line(version, status, keep_alive):
+    """
+    Encoded status and ``Connection`` lines, cached per
+    ``(version, status, keep_alive)``.
+    """
+    key = (version, status, keep_alive)
+    try:
+        return _status_lines[key]
+    except KeyError:
+        pass
+    description = STATUS_TEXT.get(status, b"UNKNOWN RESPONSE")
+    line = b"HTTP/%b %d %b\r\nConnection: %b\r\n" % (
+        version.encode(),
+        status,
+        description,
+        b"keep-alive" if keep_alive else b"close",
+    )
+    _status_lines[key] = line
+    return line
+
+
+def encode_headers(headers, parts, charset="utf-8", skip=None):
+    """
+    Append the encoded ``name: value`` lines of ``headers`` to ``parts``,
+    leaving out the lowercase names in ``skip``.
+    """
+    for name, value in headers.items():
+        if skip and name.lower() in skip:
+            continue
+        prefix = _header_names.get(name)
+        if prefix is None:
+            prefix = name.encode() + b": "
+            if len(_header_names) < MAX_CACHED_HEADER_NAMES:
+                _header_names[name] = prefix
+        if value.__class__ is not str:
+            value = str(value)
+        parts.append(prefix + value.encode(charset) + b"\r\n")
+    return parts
+
+
+def get_keep_alive_header(timeout):
+    try:
+        return _keep_alive_headers[timeout]
+    except KeyError:
+        header = _keep_alive_headers[timeout] = b"Keep-Alive: %d\r\n" % timeout
+        return header
 
 
 class JSONSerializer:
@@ -39,8 +95,32 @@ class BaseFactory:
     def create_router_object(self):
         raise NotImplementedError
 
+    def create_response_cache(self):
+        raise NotImplementedError
+
+    def create_compressor(self):
+        raise NotImplementedError
+
+    def create_json_provider(self):
+        raise NotImplementedError
+
+    def create_session_interface(self):
+        raise NotImplementedError
+
+    def create_broadcaster(self):
+        raise NotImplementedError
+
+    def create_metrics(self):
+        raise NotImplementedError
+
 
 class BaseRequest(object):
+    __slots__ = (
+        "app", "environ", "_headers", "_extra_headers", "_cookies",
+        "_cached_data", "_parsed_content_type", "disconnected",
+        "response_complete", "__dict__",
+    )
+
     charset = 'utf-8'
     encoding_errors = 'replace'
 
@@ -48,7 +128,8 @@ class BaseRequest(object):
         # Request state
         self.app = app
         self.environ = environ
-        self.headers = CIMultiDict(headers or {})
+        self._headers = None
+        self._extra_headers = headers
 
         # Response state
         self._cookies = None
@@ -56,15 +137,32 @@ class BaseRequest(object):
         self._parsed_content_type = None
         self.disconnected = False
         self.response_complete = False
-        self.match_headers()
 
     @property
     def META(self):
         return dict(self.headers, **self.environ)
 
+    @property
+    def headers(self):
+        """
+        The request headers, built from the raw header list on first access.
+        """
+        if self._headers is None:
+            self._headers = self.match_headers()
+        return self._headers
+
+    @headers.setter
+    def headers(self, value):
+        self._headers = value
+
     def match_headers(self):
-        for value in self.environ["headers"]:
-            self.headers[value[0]] = value[1]
+        headers = CIMultiDict(self._extra_headers or {})
+        for name, value in self.environ["headers"] or ():
+            if isinstance(name, bytes):
+                name = name.decode("latin-1")
+                value = value.decode("latin-1")
+            headers.add(name, value)
+        return headers
 
     @property
     def content_type(self):
@@ -103,14 +201,14 @@ class BaseRequest(object):
             rv = self.environ.get('host')
         return rv
 
-    @cached_property
+    @property
     def version(self):
         """
         The http request version.
         """
         return self.environ.get("http_version", "1.1")
 
-    @cached_property
+    @property
     def path(self):
         """
         Requested path as unicode.  This works a bit like the regular path
@@ -118,6 +216,8 @@ class BaseRequest(object):
         even if the URL root is accessed.
         """
         raw_path = self.environ.get('path') or ''
+        if raw_path.startswith('/') and not raw_path.startswith('//'):
+            return raw_path
         return '/' + raw_path.lstrip('/')
 
     @property
@@ -137,13 +237,42 @@ class BaseRequest(object):
         """
         return self.path + u'?' + to_unicode(self.query_string, self.url_charset)
 
-    @cached_property
+    @property
     def body(self):
         """
-        The reconstructed current URL as IRI.
+        The request body as bytes, available once :meth:`read_body` is done.
         """
         return self.environ.get("body")
 
+    async def read_body(self):
+        """
+        Read the whole request body from the stream, chunks are joined once.
+        """
+        if self.environ.get("body") is None:
+            chunks = []
+            async for chunk in self.stream():
+                chunks.append(chunk)
+            self.environ["body"] = b"".join(chunks)
+        return self.environ["body"]
+
+    async def stream(self):
+        """
+        Iterate over the request body chunks as they are received::
+
+            async for chunk in request.stream():
+                ...
+        """
+        body = self.environ.get("body")
+        if body is not None:
+            if body:
+                yield body
+            return
+        stream = self.environ.get("stream")
+        if stream is None:
+            return
+        async for chunk in stream:
+            yield chunk
+
     @cached_property
     def data(self):
         return self.get_data()
@@ -152,7 +281,7 @@ class BaseRequest(object):
     def form(self):
         return self.get_data(parse_form_data=True)
 
-    @cached_property
+    @property
     def url(self):
         """
         The reconstructed current URL as IRI.
@@ -174,7 +303,7 @@ class BaseRequest(object):
         """
         return get_request_url(self, root_only=True)
 
-    @cached_property
+    @property
     def ip(self):
         """
         Just the host including the ip if available.
@@ -188,14 +317,14 @@ class BaseRequest(object):
         """
         return self.get_host()
 
-    @cached_property
+    @property
     def port(self):
         """
         Just the host including the port if available.
         """
         return self.environ.get("port")
 
-    @cached_property
+    @property
     def query_string(self):
         """
         Just the request query string.
@@ -209,28 +338,28 @@ class BaseRequest(object):
         """
         return dict(parse.parse_qsl(parse.urlsplit(self.full_path).query))
 
-    @cached_property
+    @property
     def method(self):
         """
         Just the request method string.
         """
         return self.environ.get("method")
 
-    @cached_property
+    @property
     def scheme(self):
         """
         Just the request scheme string.
         """
         return self.environ.get("scheme")
 
-    @cached_property
+    @property
     def server(self):
         """
         Just the request server string.
         """
         return self.environ.get("server")
 
-    @cached_property
+    @property
     def client(self):
         """
         Just the request client string.
@@ -243,14 +372,14 @@ class BaseRequest(object):
                or self.headers.get(self.app.config['FORWARDED_FOR_HEADER']) \
                or self.headers.get(self.app.config['REMOTE_ADDR'])
 
-    @cached_property
+    @property
     def root_path(self):
         """
         Just the request root_path string.
         """
         return self.environ.get("root_path")
 
-    @cached_property
+    @property
     def transport(self):
         """
         Just the request transport string.
@@ -297,20 +426,14 @@ class BaseResponse:
         except AttributeError:
             return str(data or "").encode()
 
-    def _parse_headers(self):
-        headers = b""
-        for name, value in self.headers.items():
-            try:
-                headers += b"%b: %b\r\n" % (
-                    name.encode(),
-                    value.encode(self.charset),
-                )
-            except AttributeError:
-                headers += b"%b: %b\r\n" % (
-                    str(name).encode(),
-                    str(value).encode(self.charset),
-                )
-        return headers
+    def _parse_headers(self, parts=None, skip=None):
+        """
+        Append the encoded ``name: value`` lines to ``parts``, leaving out the
+        lowercase names in ``skip``.
+        """
+        if parts is None:
+            parts = []
+        return encode_headers(self.headers, parts, self.charset, skip)
 
     def set_cookie(self, key, value="", max_age=None, expires=None, path="/",
                    domain=None, secure=False, httponly=False, samesite=None):
@@ -336,45 +459,60 @@ class BaseResponse:
     def delete_cookie(self, key, path="/", domain=None):
         self.set_cookie(key, expires=0, max_age=0, path=path, domain=domain)
 
-    def get_headers(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
-        timeout_header = b""
+    def _serialize(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        """
+        Collect the status line and header block into a list ready for a
+        single ``b"".join``.
+        """
+        parts = [get_status_line(version, self.status, keep_alive)]
         if keep_alive and keep_alive_timeout is not None:
-            timeout_header = b"Keep-Alive: %d\r\n" % keep_alive_timeout
-        self.headers["Content-Type"] = self.headers.get(
-            "Content-Type", self.content_type
-        )
-        if self.status in (304, 412):
-            self.headers = remove_entity_headers(self.headers)
-        headers = self._parse_headers()
-        if self.status is 200:
-            description = b"OK"
-        else:
-            description = STATUS_TEXT.get(self.status, b"UNKNOWN RESPONSE")
+            parts.append(get_keep_alive_header(keep_alive_timeout))
+        if "Content-Type" not in self.headers:
+            self.headers["Content-Type"] = self.content_type
+        skip = _ENTITY_HEADER_NAMES if self.status in (304, 412) else None
+        self._parse_headers(parts, skip)
+        self._add_default_headers(parts, self.headers)
+        parts.append(b"\r\n")
+        return parts
+
+    def _add_default_headers(self, parts, headers):
+        """
+        Append the server default headers not already present in ``headers``.
+        """
+        protocol = self._protocol
+        raw_default_headers = getattr(protocol, "raw_default_headers", None)
+        if raw_default_headers:
+            names = protocol.default_header_names
+            if any(name in headers for name in names):
+                parts.extend(
+                    line for name, line in protocol.default_header_lines
+                    if name not in headers
+                )
+            else:
+                parts.append(raw_default_headers)
 
-        return (
-            b"HTTP/%b %d %b\r\n" b"Connection: %b\r\n" b"%b" b"%b\r\n"
-        ) % (
-            version.encode(),
-            self.status,
-            description,
-            b"keep-alive" if keep_alive else b"close",
-            timeout_header,
-            headers
-        )
+    def get_headers(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        return b"".join(self._serialize(version, keep_alive, keep_alive_timeout))
 
     async def output(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
         if has_message_body(self.status):
             body = self.body
-            self.headers["Content-Length"] = self.headers.get(
-                "Content-Length", len(self.body)
-            )
+            if "Content-Length" not in self.headers:
+                self.headers["Content-Length"] = str(len(body))
         else:
             body = b""
-        return self.get_headers(
-            version,
-            keep_alive,
-            keep_alive_timeout
-        ) + b"%b" % body
+        parts = self._serialize(version, keep_alive, keep_alive_timeout)
+        parts.append(body)
+        return b"".join(parts)
+
+    async def head(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        """
+        Status line and headers answering a HEAD request, with the
+        Content-Length of the body that is not sent.
+        """
+        if has_message_body(self.status) and "Content-Length" not in self.headers:
+            self.headers["Content-Length"] = str(len(self.body))
+        return self.get_headers(version, keep_alive, keep_alive_timeout)
 
 
 class BaseHTTPException(Exception):
@@ -482,6 +620,82 @@ class BaseBlueprint:
         pass
 
 
+class BaseCacheBackend:
+    """
+    Storage of serialized responses for :class:`alita.cache.ResponseCache`.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.evictions = 0
+
+    async def get(self, key):
+        raise NotImplementedError
+
+    async def set(self, key, entry):
+        raise NotImplementedError
+
+    async def delete(self, key):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+class BaseJSONProvider:
+    """
+    JSON serialization used by the app, ``dumps`` returns bytes and
+    ``loads`` accepts bytes.  ``JSON_AS_ASCII``, ``JSON_SORT_KEYS`` and
+    ``JSONIFY_PRETTYPRINT_REGULAR`` are read from the app config.
+    """
+    def __init__(self, app=None):
+        self.app = app
+
+    def get_options(self):
+        """
+        Return the ``(ensure_ascii, sort_keys, pretty)`` options.
+        """
+        if self.app is None:
+            return True, False, False
+        config = self.app.config
+        return (
+            config.get("JSON_AS_ASCII", True),
+            config.get("JSON_SORT_KEYS", False),
+            config.get("JSONIFY_PRETTYPRINT_REGULAR", False),
+        )
+
+    def dumps(self, obj):
+        raise NotImplementedError
+
+    def loads(self, data):
+        raise NotImplementedError
+
+
+class BaseSessionEngine:
+    """
+    Storage of serialized sessions for :class:`alita.sessions.SessionInterface`,
+    ``expires`` is a unix timestamp or ``None``.  ``load`` returns the
+    ``(data, expires)`` of a live session, ``None`` otherwise.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.options = app.config.get("SESSION_ENGINE_CONFIG") or {}
+
+    async def load(self, key):
+        raise NotImplementedError
+
+    async def save(self, key, data, expires):
+        raise NotImplementedError
+
+    async def delete(self, key):
+        raise NotImplementedError
+
+    async def sweep(self):
+        """
+        Remove the expired sessions and return their count.
+        """
+        raise NotImplementedError
+
+
 class BaseRoute:
     def match(self, request):
         raise NotImplementedError()
@@ -500,9 +714,14 @@ class BaseRouter:
     def url_path_for(self, endpoint, **path_params):
         raise NotImplementedError()
 
+    def url_for(self, endpoint, **path_params):
+        return self.url_path_for(endpoint, **path_params).make_url()
+
 
 class BaseConverter:
     regex = ""
+    # Whether a match of ``regex`` always stays inside one path segment.
+    part_isolating = True
 
     def convert(self, value):
         raise NotImplementedError()
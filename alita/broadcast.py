@@ -0,0 +1,215 @@
+import time
+import asyncio
+from collections import deque
+from websockets.framing import Frame, OP_TEXT, OP_BINARY
+
+# Connections written before yielding to the event loop during a broadcast.
+BROADCAST_BATCH_SIZE = 1000
+# Fan-out durations kept for the latency percentiles.
+LATENCY_SAMPLES = 1024
+
+
+def encode_frame(message):
+    """
+    Encode ``message`` as one unmasked server to client frame, ``str`` as
+    a text frame and ``bytes`` as a binary frame.
+    """
+    if isinstance(message, str):
+        opcode, data = OP_TEXT, message.encode("utf-8")
+    elif isinstance(message, (bytes, bytearray, memoryview)):
+        opcode, data = OP_BINARY, bytes(message)
+    else:
+        raise TypeError("data must be bytes or str")
+    output = []
+    Frame(True, opcode, data).write(output.append, mask=False)
+    return b"".join(output)
+
+
+class Connection:
+    """
+    A registered websocket.  Frames are written to the transport directly
+    while it accepts data, else they wait in a queue of ``max_queue``
+    frames which is flushed by one task per connection.
+    """
+    __slots__ = ("broadcaster", "ws", "protocol", "rooms", "queue", "max_queue",
+                 "closed", "_flush_task")
+
+    def __init__(self, broadcaster, ws, protocol, max_queue):
+        self.broadcaster = broadcaster
+        self.ws = ws
+        self.protocol = protocol
+        self.rooms = set()
+        self.queue = deque()
+        self.max_queue = max_queue
+        self.closed = False
+        self._flush_task = None
+
+    @property
+    def connected(self):
+        # A frame written after the close frame of the closing handshake
+        # breaks the protocol, so the websocket must still be open too.
+        transport = self.protocol.transport
+        return not self.closed and self.ws.open and \
+            transport is not None and not transport.is_closing()
+
+    def send_frame(self, frame):
+        """
+        Write or queue an encoded frame, return ``False`` when it was not
+        delivered.
+        """
+        if not self.connected:
+            self.broadcaster.unregister(self.ws)
+            return False
+        if not self.queue and not self.protocol.writing_paused:
+            self.protocol.push_data(frame)
+            return True
+        if len(self.queue) >= self.max_queue:
+            return self.broadcaster.on_queue_full(self)
+        self.queue.append(frame)
+        self.broadcaster.queued += 1
+        if self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self.flush())
+        return True
+
+    async def flush(self):
+        protocol = self.protocol
+        try:
+            while self.queue and self.connected:
+                await protocol.drain()
+                while self.queue and self.connected and not protocol.writing_paused:
+                    protocol.push_data(self.queue.popleft())
+            if not self.connected:
+                self.broadcaster.unregister(self.ws)
+        finally:
+            self.queue.clear()
+            self._flush_task = None
+
+    def close(self):
+        """
+        Abort the connection, a close frame would wait behind the data the
+        client does not read.
+        """
+        self.closed = True
+        self.queue.clear()
+        transport = self.protocol.transport
+        if transport is not None:
+            transport.abort()
+
+
+class Broadcaster:
+    """
+    Fan-out of websocket messages to endpoints and rooms.  A message is
+    framed once and written to every transport without awaiting the
+    clients, a client whose queue is full loses the message with
+    ``WEBSOCKET_SLOW_CONSUMER = "drop"`` or is disconnected with
+    ``"close"``.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.connections = {}
+        self.rooms = {}
+        self.messages = 0
+        self.deliveries = 0
+        self.queued = 0
+        self.dropped = 0
+        self.disconnected = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def register(self, ws, protocol, endpoint=None):
+        connection = Connection(
+            self, ws, protocol, self.app.config.get("WEBSOCKET_MAX_QUEUE") or 256)
+        self.connections[ws] = connection
+        if endpoint is not None:
+            self.join(ws, endpoint)
+        return connection
+
+    def unregister(self, ws):
+        connection = self.connections.pop(ws, None)
+        if connection is None:
+            return
+        for room in connection.rooms:
+            members = self.rooms.get(room)
+            if members is not None:
+                members.discard(connection)
+                if not members:
+                    del self.rooms[room]
+        connection.rooms.clear()
+
+    def join(self, ws, room):
+        connection = self.connections[ws]
+        connection.rooms.add(room)
+        self.rooms.setdefault(room, set()).add(connection)
+
+    def leave(self, ws, room):
+        connection = self.connections.get(ws)
+        if connection is None:
+            return
+        connection.rooms.discard(room)
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(connection)
+            if not members:
+                del self.rooms[room]
+
+    def on_queue_full(self, connection):
+        if self.app.config.get("WEBSOCKET_SLOW_CONSUMER") == "close":
+            self.disconnected += 1
+            self.unregister(connection.ws)
+            connection.close()
+        else:
+            self.dropped += 1
+        return False
+
+    async def broadcast(self, room, message, exclude=None):
+        """
+        Send ``message`` to every websocket of ``room`` (an endpoint name or
+        a joined room) and return the number of deliveries.
+        """
+        members = self.rooms.get(room)
+        if not members:
+            return 0
+        start = time.perf_counter()
+        frame = encode_frame(message)
+        delivered = 0
+        for index, connection in enumerate(list(members), 1):
+            if connection.ws is not exclude and connection.send_frame(frame):
+                delivered += 1
+            if index % BROADCAST_BATCH_SIZE == 0:
+                await asyncio.sleep(0)
+        self.messages += 1
+        self.deliveries += delivered
+        self.latencies.append(time.perf_counter() - start)
+        return delivered
+
+    def latency_info(self):
+        """
+        Fan-out duration percentiles in milliseconds over the last
+        broadcasts.
+        """
+        samples = sorted(self.latencies)
+        if not samples:
+            return {"count": 0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+        return {
+            "count": len(samples),
+            "p50": samples[len(samples) // 2] * 1e3,
+            "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e3,
+            "max": samples[-1] * 1e3,
+        }
+
+    def stats(self):
+        return {
+            "connections": len(self.connections),
+            "rooms": len(self.rooms),
+            "messages": self.messages,
+            "deliveries": self.deliveries,
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "disconnected": self.disconnected,
+            "latency": self.latency_info(),
+        }
+
+
+__all__ = [
+    "encode_frame",
+    "Broadcaster",
+]
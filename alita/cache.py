@@ -0,0 +1,348 @@
+import os
+import json
+import time
+import hashlib
+import asyncio
+import tempfile
+import functools
+from collections import OrderedDict
+from multidict import CIMultiDict
+from alita.base import BaseResponse, BaseCacheBackend, encode_headers, \
+    get_status_line, get_keep_alive_header
+from alita.response import HTTPResponse
+from alita.helpers import cached_property, import_string, has_message_body
+
+CACHEABLE_METHODS = frozenset(("GET", "HEAD"))
+CACHEABLE_STATUS = frozenset((200, 203, 204, 300, 301, 308, 404, 410))
+
+
+class CacheEntry:
+    """
+    A response serialized once: the encoded header lines without the
+    status and connection lines, and the body.  ``variants`` holds the
+    content-encoded copies built by :class:`~alita.compression.Compressor`.
+    """
+    __slots__ = ("status", "headers", "header_names", "body", "expires", "variants")
+
+    def __init__(self, status, headers, header_names, body, expires):
+        self.status = status
+        self.headers = headers
+        self.header_names = header_names
+        self.body = body
+        self.expires = expires
+        self.variants = None
+
+    @property
+    def size(self):
+        return len(self.headers) + len(self.body)
+
+    def is_expired(self, now=None):
+        return self.expires is not None and (now or time.time()) >= self.expires
+
+
+class CachedResponse(HTTPResponse):
+    """
+    Response replayed from a :class:`CacheEntry`.  Only the status and
+    connection lines, the server default headers and headers added after
+    the cache lookup are encoded when it is sent.
+    """
+    def __init__(self, entry):
+        super().__init__(entry.body, entry.status)
+        self.entry = entry
+
+    def _serialize(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        entry = self.entry
+        parts = [get_status_line(version, self.status, keep_alive)]
+        if keep_alive and keep_alive_timeout is not None:
+            parts.append(get_keep_alive_header(keep_alive_timeout))
+        parts.append(entry.headers)
+        header_names = entry.header_names
+        if self.headers:
+            self._parse_headers(parts)
+            header_names = header_names | {name.lower() for name in self.headers}
+        self._add_default_headers(parts, header_names)
+        parts.append(b"\r\n")
+        return parts
+
+    async def output(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        parts = self._serialize(version, keep_alive, keep_alive_timeout)
+        parts.append(self.body)
+        return b"".join(parts)
+
+    async def head(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        # The cached headers already hold the Content-Length.
+        return b"".join(self._serialize(version, keep_alive, keep_alive_timeout))
+
+
+class MemoryCacheBackend(BaseCacheBackend):
+    """
+    In-process LRU store bounded by ``RESPONSE_CACHE_MAX_ENTRIES`` and
+    ``RESPONSE_CACHE_MAX_BYTES``.
+    """
+    def __init__(self, app):
+        super().__init__(app)
+        self.max_entries = app.config.get("RESPONSE_CACHE_MAX_ENTRIES")
+        self.max_bytes = app.config.get("RESPONSE_CACHE_MAX_BYTES")
+        self.entries = OrderedDict()
+        self.size = 0
+
+    async def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.is_expired():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    async def set(self, key, entry):
+        if self.max_bytes and entry.size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        self.size += entry.size
+        while self.entries and (
+                (self.max_entries and len(self.entries) > self.max_entries)
+                or (self.max_bytes and self.size > self.max_bytes)):
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    async def delete(self, key):
+        if key in self.entries:
+            self._remove(key)
+
+    async def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= entry.size
+
+
+class FileCacheBackend(BaseCacheBackend):
+    """
+    Stores one file per entry in ``RESPONSE_CACHE_DIR``, shared by the
+    worker processes of one host.  File access runs in the default
+    executor; the oldest files are evicted above ``RESPONSE_CACHE_MAX_ENTRIES``.
+    """
+    suffix = ".cache"
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.max_entries = app.config.get("RESPONSE_CACHE_MAX_ENTRIES")
+        self.directory = app.config.get("RESPONSE_CACHE_DIR") or \
+            os.path.join(tempfile.gettempdir(), "alita-cache")
+        os.makedirs(self.directory, exist_ok=True)
+        self.count = len(self._list_files())
+
+    def get_path(self, key):
+        name = hashlib.sha1(key.encode("utf-8", "surrogateescape")).hexdigest()
+        return os.path.join(self.directory, name + self.suffix)
+
+    def _list_files(self):
+        return [
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory) if name.endswith(self.suffix)
+        ]
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                if meta["expires"] is not None and time.time() >= meta["expires"]:
+                    expired = True
+                else:
+                    expired = False
+                    headers = f.read(meta["headers"])
+                    body = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        if expired:
+            self._unlink(path)
+            return None
+        return CacheEntry(meta["status"], headers, frozenset(meta["names"]),
+                          body, meta["expires"])
+
+    def _write(self, path, entry):
+        meta = json.dumps({
+            "status": entry.status,
+            "expires": entry.expires,
+            "names": sorted(entry.header_names),
+            "headers": len(entry.headers),
+        }).encode()
+        temp_path = "%s.%d.tmp" % (path, os.getpid())
+        existed = os.path.exists(path)
+        with open(temp_path, "wb") as f:
+            f.write(b"".join((meta, b"\n", entry.headers, entry.body)))
+        os.replace(temp_path, path)
+        if not existed:
+            self.count += 1
+        if self.max_entries and self.count > self.max_entries:
+            self._evict()
+
+    def _evict(self):
+        files = []
+        for path in self._list_files():
+            try:
+                files.append((os.stat(path).st_mtime, path))
+            except OSError:
+                pass
+        files.sort()
+        self.count = len(files)
+        # Drop a tenth more than needed so that eviction is not run for
+        # every new entry.
+        excess = self.count - self.max_entries + max(1, self.max_entries // 10)
+        for _, path in files[:max(excess, 0)]:
+            if self._unlink(path):
+                self.evictions += 1
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            return False
+        self.count = max(self.count - 1, 0)
+        return True
+
+    def _clear(self):
+        for path in self._list_files():
+            self._unlink(path)
+        self.count = 0
+
+    async def run(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    async def get(self, key):
+        return await self.run(self._read, self.get_path(key))
+
+    async def set(self, key, entry):
+        await self.run(self._write, self.get_path(key), entry)
+
+    async def delete(self, key):
+        await self.run(self._unlink, self.get_path(key))
+
+    async def clear(self):
+        await self.run(self._clear)
+
+
+class ResponseCache:
+    """
+    Caches the serialized responses of idempotent views.  A hit returns a
+    :class:`CachedResponse` without calling the view::
+
+        @app.route('/articles')
+        @app.cache(ttl=60, vary=['Accept-Language'])
+        async def articles(request):
+            ...
+
+    or with the route option handled by :meth:`view_handler`::
+
+        @app.route('/articles', cache={'ttl': 60})
+    """
+    def __init__(self, app):
+        self.app = app
+        self.hits = 0
+        self.misses = 0
+
+    @cached_property
+    def backend(self):
+        backend_class = import_string(self.app.config.get(
+            "RESPONSE_CACHE_BACKEND", "alita.cache.MemoryCacheBackend"))
+        return backend_class(self.app)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+        }
+
+    @staticmethod
+    def make_key(request, vary=()):
+        parts = [request.method, request.host or "", request.path, request.query_string or ""]
+        for name in vary:
+            parts.append(request.headers.get(name, ""))
+        return "\0".join(parts)
+
+    def is_cacheable(self, response):
+        if response.status not in CACHEABLE_STATUS:
+            return False
+        # Streamed and file responses write the body themselves.
+        if type(response).output is not BaseResponse.output:
+            return False
+        if "Set-Cookie" in response.headers:
+            return False
+        cache_control = response.headers.get("Cache-Control", "").lower()
+        return "no-store" not in cache_control and "private" not in cache_control
+
+    def create_entry(self, response, ttl):
+        headers = CIMultiDict(response.headers)
+        if "Content-Type" not in headers:
+            headers["Content-Type"] = response.content_type
+        if has_message_body(response.status):
+            body = response.body
+            if "Content-Length" not in headers:
+                headers["Content-Length"] = str(len(body))
+        else:
+            body = b""
+        return CacheEntry(
+            response.status,
+            b"".join(encode_headers(headers, [], response.charset)),
+            frozenset(name.lower() for name in headers),
+            body,
+            time.time() + ttl if ttl else None,
+        )
+
+    async def get(self, request, vary=()):
+        if request.method not in CACHEABLE_METHODS:
+            return None
+        entry = await self.backend.get(self.make_key(request, vary))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedResponse(entry)
+
+    async def set(self, request, response, ttl=None, vary=()):
+        if request.method not in CACHEABLE_METHODS or not self.is_cacheable(response):
+            return
+        if vary:
+            response.headers.setdefault("Vary", ", ".join(vary))
+        if ttl is None:
+            ttl = self.app.config.get("RESPONSE_CACHE_DEFAULT_TTL")
+        await self.backend.set(self.make_key(request, vary), self.create_entry(response, ttl))
+
+    async def clear(self):
+        await self.backend.clear()
+
+    def cached(self, ttl=None, vary=None):
+        vary = tuple(vary or ())
+
+        def decorator(view_func):
+            @functools.wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                response = await self.get(request, vary)
+                if response is not None:
+                    return response
+                response = await self.app.make_response(
+                    await self.app.get_awaitable_result(view_func, request, *args, **kwargs))
+                await self.set(request, response, ttl, vary)
+                return response
+            return wrapper
+        return decorator
+
+    def view_handler(self, cache=None, **options):
+        """
+        Applies :meth:`cached` to routes declared with ``cache=ttl`` or
+        ``cache={'ttl': ttl, 'vary': [...]}``.
+        """
+        if not cache:
+            return lambda view_func: view_func
+        if isinstance(cache, dict):
+            return self.cached(**cache)
+        if cache is True:
+            return self.cached()
+        return self.cached(ttl=cache)
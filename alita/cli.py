@@ -76,10 +76,12 @@ def cli(ctx, project_dir, debug=False):
 @click.option('--debugger/--no-debugger', default=True,
               help='Enable or disable the debugger. By default the debugger '
               'is active if debug is enabled.')
+@click.option('--workers', '-w', default=1,
+              help='The number of worker processes sharing the port.')
 @click.pass_context
-def run(ctx, host, port, app, auto_reload, debugger):
+def run(ctx, host, port, app, auto_reload, debugger, workers):
     app = ctx.obj['factory'].load_app(app)
-    app.run(host=host, port=port, auto_reload=auto_reload)
+    app.run(host=host, port=port, auto_reload=auto_reload, workers=workers)
 
 
 def main():
@@ -0,0 +1,243 @@
+import zlib
+import asyncio
+from alita.base import BaseResponse
+from alita.cache import CacheEntry, CachedResponse
+from alita.response import StreamHTTPResponse
+from alita.helpers import has_message_body, parse_options_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MAX_CACHED_ACCEPT_ENCODINGS = 256
+
+
+def gzip_compress(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def brotli_compress(data, level):
+    return brotli.compress(data, quality=level)
+
+
+class GzipStreamEncoder:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        # Flush every chunk so that streamed events are not held back.
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+class BrotliStreamEncoder:
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+def add_vary(headers, name):
+    vary = headers.get("Vary")
+    if not vary:
+        headers["Vary"] = name
+    elif name.lower() not in [v.strip().lower() for v in vary.split(",")] and vary != "*":
+        headers["Vary"] = "%s, %s" % (vary, name)
+
+
+class Compressor:
+    """
+    Negotiates ``Accept-Encoding`` and compresses response bodies with
+    brotli (when the ``brotli`` package is installed) or gzip.
+
+    Bodies smaller than ``COMPRESS_MIN_SIZE`` or with a content type
+    outside ``COMPRESS_MIMETYPES`` are sent as is, bodies larger than
+    ``COMPRESS_EXECUTOR_MIN_SIZE`` are compressed in the default executor.
+    :class:`~alita.response.StreamHTTPResponse` chunks are compressed as
+    they are written.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.accept_encodings = {}
+
+    @property
+    def enabled(self):
+        return self.app.config.get("COMPRESS_ENABLED")
+
+    @property
+    def algorithms(self):
+        algorithms = self.app.config.get("COMPRESS_ALGORITHMS") or ()
+        return [name for name in algorithms if name != "br" or brotli is not None]
+
+    def parse_accept_encoding(self, accept_encoding):
+        """
+        Return the ``{coding: quality}`` mapping of an ``Accept-Encoding``
+        header, memoised per header value.
+        """
+        try:
+            return self.accept_encodings[accept_encoding]
+        except KeyError:
+            pass
+        accepted = {}
+        for item in accept_encoding.split(","):
+            coding, params = parse_options_header(item.strip())
+            if not coding:
+                continue
+            try:
+                quality = float(params.get("q", 1))
+            except ValueError:
+                quality = 0
+            accepted[coding.lower()] = quality
+        if len(self.accept_encodings) >= MAX_CACHED_ACCEPT_ENCODINGS:
+            self.accept_encodings.clear()
+        self.accept_encodings[accept_encoding] = accepted
+        return accepted
+
+    def negotiate(self, accept_encoding, algorithms=None):
+        """
+        Return the supported codings of an ``Accept-Encoding`` header, the
+        preferred one first.  Equal qualities keep the order of
+        ``algorithms``.
+        """
+        if not accept_encoding:
+            return []
+        accepted = self.parse_accept_encoding(accept_encoding)
+        if algorithms is None:
+            algorithms = self.algorithms
+        qualities = []
+        for index, name in enumerate(algorithms):
+            quality = accepted.get(name, accepted.get("*", 0))
+            if quality > 0:
+                qualities.append((-quality, index, name))
+        return [name for _, _, name in sorted(qualities)]
+
+    def select(self, request):
+        codings = self.negotiate(request.headers.get("Accept-Encoding"))
+        return codings[0] if codings else None
+
+    def is_compressible(self, response):
+        mimetype = response.headers.get("Content-Type", response.content_type)
+        mimetype = mimetype.split(";", 1)[0].strip().lower()
+        return mimetype in (self.app.config.get("COMPRESS_MIMETYPES") or ())
+
+    def compress_body(self, coding, data):
+        if coding == "br":
+            return brotli_compress(data, self.app.config.get("COMPRESS_BR_LEVEL"))
+        return gzip_compress(data, self.app.config.get("COMPRESS_LEVEL"))
+
+    def create_stream_encoder(self, coding):
+        if coding == "br":
+            return BrotliStreamEncoder(self.app.config.get("COMPRESS_BR_LEVEL"))
+        return GzipStreamEncoder(self.app.config.get("COMPRESS_LEVEL"))
+
+    async def compress_data(self, coding, data):
+        if len(data) >= self.app.config.get("COMPRESS_EXECUTOR_MIN_SIZE"):
+            return await asyncio.get_event_loop().run_in_executor(
+                None, self.compress_body, coding, data)
+        return self.compress_body(coding, data)
+
+    async def compress(self, request, response):
+        """
+        Return ``response`` with its body encoded for ``request``.
+        """
+        if not has_message_body(response.status) or \
+                "Content-Encoding" in response.headers:
+            return response
+        if isinstance(response, CachedResponse):
+            return await self.compress_cached(request, response)
+        if not self.is_compressible(response):
+            return response
+        if isinstance(response, StreamHTTPResponse):
+            # Byte ranges refer to the unencoded file.
+            if getattr(response, "_range", None) or getattr(response, "multipart", None) \
+                    or not response.compressible:
+                return response
+            add_vary(response.headers, "Accept-Encoding")
+            coding = self.select(request)
+            if coding is not None:
+                response.headers["Content-Encoding"] = coding
+                response.encoder = self.create_stream_encoder(coding)
+            return response
+        # File responses write their body themselves.
+        if type(response).output is not BaseResponse.output:
+            return response
+        if len(response.body) < self.app.config.get("COMPRESS_MIN_SIZE"):
+            return response
+        add_vary(response.headers, "Accept-Encoding")
+        coding = self.select(request)
+        if coding is None:
+            return response
+        body = await self.compress_data(coding, response.body)
+        if len(body) >= len(response.body):
+            return response
+        response.body = body
+        response.headers["Content-Encoding"] = coding
+        response.headers["Content-Length"] = str(len(body))
+        return response
+
+    async def compress_cached(self, request, response):
+        """
+        Cached responses keep one encoded variant per coding on their entry.
+        """
+        entry = response.entry
+        if "content-encoding" in entry.header_names or \
+                len(entry.body) < self.app.config.get("COMPRESS_MIN_SIZE"):
+            return response
+        content_type = b""
+        for line in entry.headers.split(b"\r\n"):
+            if line[:13].lower() == b"content-type:":
+                content_type = line[13:].strip().decode("latin-1")
+        if content_type.split(";", 1)[0].strip().lower() not in \
+                (self.app.config.get("COMPRESS_MIMETYPES") or ()):
+            return response
+        coding = self.select(request)
+        if coding is None:
+            # Repeated header lines are combined by the client.
+            response.headers.add("Vary", "Accept-Encoding")
+            return response
+        variants = entry.variants
+        if variants is None:
+            variants = entry.variants = {}
+        variant = variants.get(coding)
+        if variant is None:
+            body = await self.compress_data(coding, entry.body)
+            if len(body) >= len(entry.body):
+                variant = entry
+            else:
+                variant = self.create_variant(entry, coding, body)
+            variants[coding] = variant
+        cached = CachedResponse(variant)
+        cached.headers.extend(response.headers)
+        return cached
+
+    @staticmethod
+    def create_variant(entry, coding, body):
+        lines = []
+        vary = None
+        for line in entry.headers.split(b"\r\n"):
+            name = line.split(b":", 1)[0].strip().lower()
+            if not line or name == b"content-length":
+                continue
+            if name == b"vary":
+                vary = line.split(b":", 1)[1].strip()
+                continue
+            lines.append(line + b"\r\n")
+        vary = vary + b", Accept-Encoding" if vary else b"Accept-Encoding"
+        lines.append(b"Vary: %b\r\n" % vary)
+        lines.append(b"Content-Encoding: %b\r\n" % coding.encode())
+        lines.append(b"Content-Length: %d\r\n" % len(body))
+        return CacheEntry(
+            entry.status,
+            b"".join(lines),
+            entry.header_names | {"content-encoding", "vary"},
+            body,
+            entry.expires,
+        )
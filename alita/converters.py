@@ -17,6 +17,7 @@ class StringConverter(BaseConverter):
 
 class PathConverter(BaseConverter):
     regex = ".*"
+    part_isolating = False
 
     def convert(self, value):
         return str(value)
@@ -38,7 +39,7 @@ class IntegerConverter(BaseConverter):
 
 
 class FloatConverter(BaseConverter):
-    regex = "[0-9]+(.[0-9]+)?"
+    regex = r"[0-9]+(\.[0-9]+)?"
 
     def convert(self, value):
         return float(value)
@@ -0,0 +1,260 @@
+from collections import deque
+from alita.response import HTTPResponse, StreamHTTPResponse
+
+
+def format_event(data=None, event=None, id=None, retry=None, comment=None):
+    """
+    Serialize one Server-Sent Event, ``data`` lines are split so that
+    multi-line payloads keep their line breaks.
+    """
+    lines = []
+    if comment is not None:
+        lines.extend(": %s" % line for line in str(comment).splitlines() or [""])
+    if id is not None:
+        lines.append("id: %s" % id)
+    if event is not None:
+        lines.append("event: %s" % event)
+    if retry is not None:
+        lines.append("retry: %d" % retry)
+    if data is not None:
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        lines.extend("data: %s" % line for line in str(data).splitlines() or [""])
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+def frame_chunk(data):
+    """
+    Frame ``data`` as one chunk of a chunked transfer coded body.
+    """
+    return b"%x\r\n%b\r\n" % (len(data), data)
+
+
+class Event:
+    """
+    A published message, serialized and chunk-framed once for all the
+    subscribers.
+    """
+    __slots__ = ("id", "chunk")
+
+    def __init__(self, id, chunk):
+        self.id = id
+        self.chunk = chunk
+
+
+class Subscriber:
+    """
+    One connected client of an :class:`EventHub`.  Chunks are written to
+    the transport directly while it accepts data, else they are queued up
+    to ``max_queue`` and the client is dropped when the queue is full.
+    """
+    __slots__ = ("hub", "protocol", "queue", "max_queue", "closed", "dropped", "_waiter")
+
+    def __init__(self, hub, protocol, max_queue):
+        self.hub = hub
+        self.protocol = protocol
+        self.queue = deque()
+        self.max_queue = max_queue
+        self.closed = False
+        self.dropped = False
+        self._waiter = None
+
+    @property
+    def connected(self):
+        transport = self.protocol.transport
+        return transport is not None and not transport.is_closing()
+
+    def send(self, chunk):
+        if self.closed:
+            return
+        if not self.connected:
+            self.close()
+            return
+        if not self.queue and not self.protocol.writing_paused:
+            self.protocol.push_data(chunk)
+            return
+        if len(self.queue) >= self.max_queue:
+            self.dropped = True
+            self.hub.dropped += 1
+            self.close()
+            return
+        self.queue.append(chunk)
+        self._wakeup()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.queue.clear()
+            self.hub.unsubscribe(self)
+            self._wakeup()
+
+    def _wakeup(self):
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    async def run(self):
+        """
+        Write the queued chunks until the subscriber is closed.
+        """
+        protocol = self.protocol
+        while not self.closed:
+            if not self.queue:
+                self._waiter = protocol.loop.create_future()
+                try:
+                    await self._waiter
+                finally:
+                    self._waiter = None
+                continue
+            while self.queue and not self.closed:
+                protocol.push_data(self.queue.popleft())
+                await protocol.drain()
+                if not self.connected:
+                    self.close()
+
+
+class EventHub:
+    """
+    Broadcasts events to the connected :class:`EventSourceResponse`
+    clients.  The last ``history`` events are kept for the clients that
+    reconnect with a ``Last-Event-ID`` header, and a comment is sent every
+    ``heartbeat`` seconds so that idle connections are kept open and
+    closed ones are detected.
+    """
+    def __init__(self, history=1000, max_queue=256, heartbeat=15, retry=None):
+        self.history = deque(maxlen=history)
+        self.max_queue = max_queue
+        self.heartbeat = heartbeat
+        self.retry = retry
+        self.subscribers = set()
+        self.last_id = 0
+        self.published = 0
+        self.dropped = 0
+        self._heartbeat_handle = None
+        self._heartbeat_chunk = frame_chunk(format_event(comment="ping"))
+
+    def publish(self, data, event=None, id=None):
+        """
+        Send an event to every subscriber and return its id.  Ids default
+        to an increasing counter.
+        """
+        if id is None:
+            self.last_id += 1
+            id = self.last_id
+        id = str(id)
+        chunk = frame_chunk(format_event(data, event=event, id=id))
+        self.history.append(Event(id, chunk))
+        self.published += 1
+        self.broadcast(chunk)
+        return id
+
+    def broadcast(self, chunk):
+        for subscriber in list(self.subscribers):
+            subscriber.send(chunk)
+
+    def replay(self, last_event_id):
+        """
+        Return the chunks of the events published after ``last_event_id``,
+        every kept event when that id is no longer in the history.
+        """
+        if last_event_id is None:
+            return []
+        events = list(self.history)
+        for index in range(len(events) - 1, -1, -1):
+            if events[index].id == last_event_id:
+                return [event.chunk for event in events[index + 1:]]
+        return [event.chunk for event in events]
+
+    def subscribe(self, protocol):
+        subscriber = Subscriber(self, protocol, self.max_queue)
+        self.subscribers.add(subscriber)
+        if self.heartbeat and self._heartbeat_handle is None:
+            self._heartbeat_handle = protocol.loop.call_later(
+                self.heartbeat, self.send_heartbeat, protocol.loop)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def send_heartbeat(self, loop):
+        self.broadcast(self._heartbeat_chunk)
+        if self.subscribers:
+            self._heartbeat_handle = loop.call_later(
+                self.heartbeat, self.send_heartbeat, loop)
+        else:
+            self._heartbeat_handle = None
+
+    def response(self, request, **kwargs):
+        """
+        Return an :class:`EventSourceResponse` subscribing ``request`` to
+        this hub.
+        """
+        return EventSourceResponse(
+            hub=self, last_event_id=request.headers.get("Last-Event-ID"), **kwargs)
+
+    def close(self):
+        for subscriber in list(self.subscribers):
+            subscriber.close()
+        if self._heartbeat_handle is not None:
+            self._heartbeat_handle.cancel()
+            self._heartbeat_handle = None
+
+
+class EventSourceResponse(StreamHTTPResponse, HTTPResponse):
+    """
+    ``text/event-stream`` response.  With a ``hub`` the client receives the
+    events published on the hub, else ``stream_fn`` sends its own events
+    with :meth:`send`.
+    """
+    def __init__(self, stream_fn=None, hub=None, last_event_id=None, status=200,
+                 headers=None, content_type="text/event-stream; charset=utf-8"):
+        if stream_fn is None and hub is None:
+            raise TypeError("EventSourceResponse requires a stream_fn or a hub.")
+        super().__init__(stream_fn, status, headers, content_type)
+        self.hub = hub
+        self.last_event_id = last_event_id
+        # Hub chunks are shared by all the subscribers and sent as is.
+        self.compressible = hub is None
+        self.headers.setdefault("Cache-Control", "no-cache")
+        self.headers.setdefault("X-Accel-Buffering", "no")
+
+    async def send(self, data=None, event=None, id=None, retry=None, comment=None):
+        await self.write(format_event(data, event, id, retry, comment))
+
+    async def output(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        if self.hub is None:
+            return await super().output(version, keep_alive, keep_alive_timeout)
+        if not self.has_protocol():
+            raise RuntimeError("Http protocol not set, "
+                               "stream response can not execute.")
+        protocol = self._protocol
+        self.headers["Transfer-Encoding"] = "chunked"
+        self.headers.pop("Content-Length", None)
+        protocol.push_data(self.get_headers(version, keep_alive, keep_alive_timeout))
+        if self.hub.retry is not None:
+            protocol.push_data(frame_chunk(format_event(retry=self.hub.retry)))
+        for chunk in self.hub.replay(self.last_event_id):
+            protocol.push_data(chunk)
+        subscriber = self.hub.subscribe(protocol)
+        # The stream lasts as long as the client, closed clients are found
+        # by the heartbeat instead of response_timeout.
+        protocol.cancel_response_timeout()
+        try:
+            await protocol.drain()
+            await subscriber.run()
+        finally:
+            subscriber.close()
+        if subscriber.dropped:
+            # The client reconnects and resumes from its Last-Event-ID.
+            protocol.close()
+        if protocol.transport is None:
+            return b""
+        protocol.push_data(b"0\r\n\r\n")
+        return b""
+
+
+__all__ = [
+    "format_event",
+    "EventHub",
+    "EventSourceResponse",
+]
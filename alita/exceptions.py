@@ -512,6 +512,19 @@ class ServiceUnavailable(HTTPException):
         'later.'
     )
 
+    def __init__(self, description=None, response=None, retry_after=None):
+        """Takes an optional number of seconds sent in the `Retry-After`
+        header.
+        """
+        HTTPException.__init__(self, description, response)
+        self.retry_after = retry_after
+
+    def get_headers(self, environ=None):
+        headers = HTTPException.get_headers(self, environ)
+        if self.retry_after is not None:
+            headers.append(('Retry-After', str(self.retry_after)))
+        return headers
+
 
 class GatewayTimeout(HTTPException):
 
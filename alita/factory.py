@@ -2,6 +2,7 @@ import os
 import sys
 import importlib
 from alita.base import BaseFactory
+from alita.helpers import import_string
 
 
 def prepare_import(path):
@@ -72,8 +73,38 @@ class AppFactory(BaseFactory):
         return ExceptionHandler(self.app)
 
     def create_router_object(self):
-        from alita.routing import Router
-        return Router(self.app)
+        router_class = import_string(self.app.config.get(
+            "ROUTER_CLASS", "alita.routing.Router"))
+        return router_class(self.app)
+
+    def create_response_cache(self):
+        from alita.cache import ResponseCache
+        return ResponseCache(self.app)
+
+    def create_compressor(self):
+        from alita.compression import Compressor
+        return Compressor(self.app)
+
+    def create_json_provider(self):
+        from alita.json_provider import get_default_provider_class
+        provider_class = self.app.config.get("JSON_PROVIDER_CLASS")
+        if provider_class:
+            provider_class = import_string(provider_class)
+        else:
+            provider_class = get_default_provider_class()
+        return provider_class(self.app)
+
+    def create_session_interface(self):
+        from alita.sessions import SessionInterface
+        return SessionInterface(self.app)
+
+    def create_broadcaster(self):
+        from alita.broadcast import Broadcaster
+        return Broadcaster(self.app)
+
+    def create_metrics(self):
+        from alita.metrics import Metrics
+        return Metrics(self.app)
 
     def create_static_handler(self):
         from alita.handler import StaticHandler
@@ -1,13 +1,19 @@
 import os
 import sys
+import stat
 import time
 import logging
+import mimetypes
+from collections import OrderedDict
 from alita.base import BaseExceptionHandler, BaseStaticHandler
 from alita.exceptions import default_exceptions, NotFound, BadRequest,\
     InternalServerError, WebSocketConnectionClosed
-from alita.response import FileResponse
+from alita.helpers import http_date, parse_http_date, parse_etags
+from alita.ranges import if_range_matches
+from alita.response import FileResponse, HTTPResponse
 
 IGNORE_EXCEPTIONS = (WebSocketConnectionClosed, )
+PRECOMPRESSED_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
 
 
 class ExceptionHandler(BaseExceptionHandler):
@@ -78,19 +84,121 @@ class ExceptionHandler(BaseExceptionHandler):
             return await self.process_exception(request, ex)
 
 
+class StaticFile:
+    """
+    Metadata of a static file kept by :class:`StaticHandler` for
+    ``STATIC_FILE_CACHE_TTL`` seconds.
+    """
+    __slots__ = ("filename", "size", "mtime", "tag", "etag", "last_modified",
+                 "mime_type", "checked_at", "encodings")
+
+    def __init__(self, filename, stat_result, checked_at):
+        self.filename = filename
+        self.size = stat_result.st_size
+        self.mtime = int(stat_result.st_mtime)
+        self.tag = "%x-%x-%x" % (
+            stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+        self.etag = 'W/"%s"' % self.tag
+        self.last_modified = http_date(self.mtime)
+        self.mime_type = mimetypes.guess_type(filename)[0] or "text/plain"
+        self.checked_at = checked_at
+        self.encodings = None
+
+    def is_modified(self, request):
+        """
+        Evaluate ``If-None-Match``, or ``If-Modified-Since`` when no entity
+        tag was sent.
+        """
+        headers = request.headers
+        if_none_match = headers.get("If-None-Match")
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            return "*" not in etags and self.tag not in etags
+        if_modified_since = parse_http_date(headers.get("If-Modified-Since"))
+        if if_modified_since is not None:
+            return self.mtime > if_modified_since
+        return True
+
+
 class StaticHandler(BaseStaticHandler):
+    def __init__(self, app):
+        super().__init__(app)
+        self.files = OrderedDict()
+
+    def get_static_file(self, filename):
+        """
+        Return the cached :class:`StaticFile` of ``filename``, stat it again
+        once the cache entry is older than ``STATIC_FILE_CACHE_TTL``.
+        """
+        ttl = self.app.config.get("STATIC_FILE_CACHE_TTL") or 0
+        now = time.monotonic()
+        static_file = self.files.get(filename)
+        if static_file is not None and now - static_file.checked_at < ttl:
+            return static_file
+        try:
+            stat_result = os.stat(filename)
+        except OSError:
+            stat_result = None
+        except ValueError:
+            raise BadRequest()
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            self.files.pop(filename, None)
+            raise NotFound()
+        static_file = StaticFile(filename, stat_result, now)
+        if ttl:
+            self.files[filename] = static_file
+            self.files.move_to_end(filename)
+            max_entries = self.app.config.get("STATIC_FILE_CACHE_SIZE") or 0
+            while len(self.files) > max_entries:
+                self.files.popitem(last=False)
+        return static_file
+
+    def get_precompressed_files(self, static_file):
+        """
+        Return the ``{coding: StaticFile}`` mapping of the ``.br`` and
+        ``.gz`` siblings of ``static_file``, looked up once per cache entry.
+        """
+        if static_file.encodings is None:
+            encodings = {}
+            for coding, suffix in PRECOMPRESSED_SUFFIXES:
+                try:
+                    encodings[coding] = self.get_static_file(static_file.filename + suffix)
+                except NotFound:
+                    pass
+            static_file.encodings = encodings
+        return static_file.encodings
+
     async def send_static_file(self, request, file_name):
         if not self.has_static_folder:
             raise RuntimeError('No static folder for this object')
         file_max_age = self.send_file_max_age
-        filename = os.path.join(self.static_folder, file_name)
         try:
-            if not os.path.isfile(filename):
-                raise NotFound()
-        except (TypeError, ValueError):
+            filename = os.path.join(self.static_folder, file_name)
+        except TypeError:
             raise BadRequest()
+        static_file = self.get_static_file(filename)
+        mime_type = static_file.mime_type
         headers = {}
+        if self.app.config.get("COMPRESS_STATIC"):
+            encodings = self.get_precompressed_files(static_file)
+            if encodings:
+                headers['Vary'] = 'Accept-Encoding'
+                codings = self.app.compressor.negotiate(
+                    request.headers.get('Accept-Encoding'), tuple(encodings))
+                if codings:
+                    headers['Content-Encoding'] = codings[0]
+                    static_file = encodings[codings[0]]
+        headers['ETag'] = static_file.etag
+        headers['Last-Modified'] = static_file.last_modified
+        headers['Accept-Ranges'] = 'bytes'
         if file_max_age is not None:
             headers['Cache-Control'] = 'max-age=%s' % file_max_age
-            headers['Expires'] = time.time() + file_max_age
-        return FileResponse(filename, headers=headers)
+            headers['Expires'] = http_date(time.time() + file_max_age)
+        if request.method in ('GET', 'HEAD') and not static_file.is_modified(request):
+            return HTTPResponse(status=304, headers=headers)
+        ranges = None
+        if request.range is not None and if_range_matches(
+                request.headers.get('If-Range'), static_file.etag, static_file.mtime):
+            ranges = request.range.resolve(static_file.size)
+        return FileResponse(static_file.filename, mime_type=mime_type,
+                            _range=ranges, headers=headers)
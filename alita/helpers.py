@@ -2,9 +2,11 @@ import os
 import re
 import sys
 import json
+import asyncio
 import pkgutil
+import email.utils
 import importlib
-from functools import singledispatch, update_wrapper
+from functools import singledispatch, update_wrapper, partial
 from urllib.parse import urlencode, parse_qs, urlsplit,\
     urlunsplit, unquote_to_bytes
 
@@ -384,3 +386,55 @@ def method_dispatch(func):
     wrapper.register = dispatcher.register
     update_wrapper(wrapper, func)
     return wrapper
+
+
+def is_coroutine_callable(func):
+    """
+    Whether calling ``func`` returns a coroutine, looks through
+    ``functools.partial`` and objects with an ``async def __call__``.
+    """
+    while isinstance(func, partial):
+        func = func.func
+    return asyncio.iscoroutinefunction(func) or \
+        asyncio.iscoroutinefunction(getattr(func, "__call__", None))
+
+
+def http_date(timestamp=None):
+    """
+    Format a unix timestamp as an RFC 7231 HTTP-date.
+    """
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+def parse_http_date(value):
+    """
+    Parse an HTTP-date into a unix timestamp, ``None`` if it is invalid.
+    """
+    if not value:
+        return None
+    try:
+        parsed = email.utils.parsedate_tz(value.strip())
+    except (TypeError, ValueError):
+        return None
+    if parsed is None:
+        return None
+    return email.utils.mktime_tz(parsed)
+
+
+def parse_etags(value):
+    """
+    Parse an ``If-None-Match``/``If-Match`` header into the set of opaque
+    entity tags, weak prefixes are dropped.  ``*`` is kept as is.
+    """
+    etags = set()
+    if not value:
+        return etags
+    for match in _etag_re.finditer(value):
+        quoted, raw = match.group(2), match.group(3)
+        if raw == "*":
+            etags.add("*")
+        elif quoted is not None:
+            etags.add(quoted)
+        elif raw:
+            etags.add(raw.strip())
+    return etags
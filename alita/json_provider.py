@@ -0,0 +1,105 @@
+import json
+from alita.base import BaseJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class StdJSONProvider(BaseJSONProvider):
+    """
+    Provider backed by the standard library, one encoder is kept per
+    combination of options.
+    """
+    def __init__(self, app=None):
+        super().__init__(app)
+        self.encoders = {}
+
+    def get_encoder(self, options):
+        try:
+            return self.encoders[options]
+        except KeyError:
+            ensure_ascii, sort_keys, pretty = options
+            encoder = self.encoders[options] = json.JSONEncoder(
+                ensure_ascii=ensure_ascii,
+                sort_keys=sort_keys,
+                indent=2 if pretty else None,
+                separators=(",", ": ") if pretty else (",", ":"),
+            )
+            return encoder
+
+    def dumps(self, obj):
+        return self.get_encoder(self.get_options()).encode(obj).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class UJSONProvider(BaseJSONProvider):
+    def dumps(self, obj):
+        ensure_ascii, sort_keys, pretty = self.get_options()
+        return ujson.dumps(
+            obj,
+            ensure_ascii=ensure_ascii,
+            sort_keys=sort_keys,
+            indent=2 if pretty else 0,
+        ).encode("utf-8")
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+class OrjsonProvider(BaseJSONProvider):
+    """
+    Provider backed by orjson, which serializes straight to UTF-8 bytes.
+    orjson cannot escape non ASCII characters, with ``JSON_AS_ASCII`` such
+    documents are encoded by the standard library instead.
+    """
+    def __init__(self, app=None):
+        super().__init__(app)
+        self.fallback = StdJSONProvider(app)
+
+    def dumps(self, obj):
+        options = self.get_options()
+        ensure_ascii, sort_keys, pretty = options
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        data = orjson.dumps(obj, option=option)
+        if ensure_ascii and not data.isascii():
+            return self.fallback.get_encoder(options).encode(obj).encode("utf-8")
+        return data
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+def get_default_provider_class():
+    """
+    Return the fastest available provider: orjson, ujson, then json.
+    """
+    if orjson is not None:
+        return OrjsonProvider
+    if ujson is not None:
+        return UJSONProvider
+    return StdJSONProvider
+
+
+default_provider = get_default_provider_class()()
+
+
+__all__ = [
+    "StdJSONProvider",
+    "UJSONProvider",
+    "OrjsonProvider",
+    "get_default_provider_class",
+    "default_provider",
+]
@@ -0,0 +1,336 @@
+import os
+import json
+import time
+import asyncio
+from bisect import bisect_left
+from alita.response import TextResponse
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(labelnames, labels, extra=None):
+    pairs = list(zip(labelnames, labels))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join(
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"')
+                     .replace("\n", "\\n"))
+        for name, value in pairs)
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    """
+    Values of one metric per label tuple.  Workers run a single event
+    loop, so values are updated without locks.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def header(self):
+        return "# HELP %s %s\n# TYPE %s %s\n" % (
+            self.name, self.documentation, self.name, self.type)
+
+    def render(self, values=None):
+        lines = [self.header()]
+        if values is None:
+            values = self.values
+        for labels, value in sorted(values.items()):
+            lines.append("%s%s %s\n" % (
+                self.name, format_labels(self.labelnames, labels), format_value(value)))
+        return "".join(lines)
+
+    def merge(self, values, other):
+        for labels, value in other.items():
+            values[labels] = values.get(labels, 0) + value
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, labels=(), amount=1):
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value, labels=()):
+        self.values[labels] = value
+
+
+class Histogram(Metric):
+    """
+    Histogram with fixed upper bounds, each label tuple keeps one count per
+    bucket, the last one for ``+Inf``, followed by the sum.
+    """
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        counts = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def render(self, values=None):
+        lines = [self.header()]
+        bounds = self.buckets + (float("inf"),)
+        if values is None:
+            values = self.values
+        for labels, counts in sorted(values.items()):
+            total = 0
+            for bound, count in zip(bounds, counts):
+                total += count
+                lines.append("%s_bucket%s %d\n" % (
+                    self.name,
+                    format_labels(self.labelnames, labels, ("le", format_value(bound))),
+                    total))
+            label_text = format_labels(self.labelnames, labels)
+            lines.append("%s_sum%s %s\n" % (self.name, label_text, format_value(counts[-1])))
+            lines.append("%s_count%s %d\n" % (self.name, label_text, total))
+        return "".join(lines)
+
+    def merge(self, values, other):
+        for labels, counts in other.items():
+            current = values.get(labels)
+            if current is None:
+                values[labels] = list(counts)
+            else:
+                for index, count in enumerate(counts):
+                    current[index] += count
+
+
+class PhaseTimer:
+    """
+    Accumulates the time spent in each phase of one request, a phase ends
+    at each :meth:`mark`.
+    """
+    __slots__ = ("start", "last", "phases")
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.phases = {}
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        phases = self.phases
+        phases[phase] = phases.get(phase, 0.0) + now - self.last
+        self.last = now
+
+
+class Metrics:
+    """
+    Request and server metrics of the app, rendered in the Prometheus text
+    format on ``METRICS_ROUTE``.
+
+    With ``METRICS_MULTIPROC_DIR`` every worker writes a snapshot of its
+    values to that directory every ``METRICS_FLUSH_INTERVAL`` seconds and
+    the metrics route sums the snapshots of all workers, gauges only of
+    the workers still running.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.metrics = []
+        buckets = app.config.get("METRICS_BUCKETS") or DEFAULT_BUCKETS
+        self.requests = self.add(Counter(
+            "alita_requests_total", "Requests by endpoint, method and status.",
+            ("endpoint", "method", "status")))
+        self.duration = self.add(Histogram(
+            "alita_request_duration_seconds", "Time to handle a request.",
+            buckets=buckets))
+        self.phases = self.add(Histogram(
+            "alita_request_phase_seconds",
+            "Time spent per request in routing, body, middleware, view, "
+            "serialization and output.", ("phase",), buckets))
+        self.connections = self.add(Gauge("alita_open_connections", "Open connections."))
+        self.tasks = self.add(Gauge("alita_inflight_tasks", "Requests being handled."))
+        self.websockets = self.add(Gauge(
+            "alita_websocket_connections", "Open websocket connections."))
+        self.buffered = self.add(Gauge(
+            "alita_write_buffered_bytes", "Bytes waiting in the transport write buffers."))
+        self.connections_total = self.add(Counter(
+            "alita_connections_total", "Accepted connections."))
+        self.received = self.add(Counter("alita_received_bytes_total", "Bytes received."))
+        self.sent = self.add(Counter("alita_sent_bytes_total", "Bytes sent."))
+        self.rejected = self.add(Counter(
+            "alita_rejected_requests_total",
+            "Requests answered with 503 by the concurrency limits."))
+        self._flush_handle = None
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    @property
+    def enabled(self):
+        return self.app.config.get("METRICS_ENABLED")
+
+    @property
+    def path(self):
+        return self.app.config.get("METRICS_ROUTE") or "/metrics"
+
+    @property
+    def multiprocess_dir(self):
+        return self.app.config.get("METRICS_MULTIPROC_DIR")
+
+    def create_timer(self):
+        if self._flush_handle is None and self.multiprocess_dir:
+            self.schedule_flush()
+        return PhaseTimer()
+
+    def observe(self, request, response, timer):
+        if request is not None:
+            self.requests.inc((request.endpoint or "", request.method, response.status))
+        else:
+            self.requests.inc(("", "", response.status))
+        self.duration.observe(timer.last - timer.start)
+        observe = self.phases.observe
+        for phase, seconds in timer.phases.items():
+            observe(seconds, (phase,))
+
+    def collect_server_state(self):
+        """
+        Copy the counters kept by the server into the metrics.
+        """
+        server_state = getattr(self.app, "server_state", None)
+        if server_state is None:
+            return
+        self.connections.set(len(server_state.connections))
+        self.tasks.set(len(server_state.tasks))
+        self.buffered.set(server_state.buffered_bytes)
+        self.connections_total.values[()] = server_state.total_connections
+        self.received.values[()] = server_state.bytes_received
+        self.sent.values[()] = server_state.bytes_sent
+        self.rejected.values[()] = server_state.rejected_requests
+        broadcaster = self.app.broadcaster
+        if broadcaster is not None:
+            self.websockets.set(len(broadcaster.connections))
+
+    def snapshot(self):
+        self.collect_server_state()
+        return {
+            metric.name: [[list(labels), value] for labels, value in metric.values.items()]
+            for metric in self.metrics
+        }
+
+    def get_snapshot_path(self, pid=None):
+        return os.path.join(self.multiprocess_dir, "%d.json" % (pid or os.getpid()))
+
+    def write_snapshot(self):
+        path = self.get_snapshot_path()
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temp_path, path)
+
+    def schedule_flush(self):
+        interval = self.app.config.get("METRICS_FLUSH_INTERVAL") or 5
+        loop = asyncio.get_event_loop()
+
+        def flush():
+            try:
+                self.write_snapshot()
+            except OSError:
+                self.app.logger.exception("Failed to write the metrics snapshot")
+            self._flush_handle = loop.call_later(interval, flush)
+
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        self._flush_handle = loop.call_later(interval, flush)
+
+    def clear_snapshots(self):
+        """
+        Remove the snapshots of a previous run, called by the supervisor
+        before the workers are started.
+        """
+        directory = self.multiprocess_dir
+        if not directory or not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                os.unlink(os.path.join(directory, name))
+
+    @staticmethod
+    def is_running(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def aggregate(self):
+        """
+        Return the ``{name: {labels: value}}`` values of all the workers
+        from their snapshots.
+        """
+        merged = {metric.name: {} for metric in self.metrics}
+        kinds = {metric.name: metric for metric in self.metrics}
+        directory = self.multiprocess_dir
+        for name in os.listdir(directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                pid = int(name[:-5])
+                with open(os.path.join(directory, name)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            running = self.is_running(pid)
+            for metric_name, items in snapshot.items():
+                metric = kinds.get(metric_name)
+                if metric is None or metric.type == "gauge" and not running:
+                    continue
+                metric.merge(merged[metric_name], {
+                    tuple(labels): value for labels, value in items})
+        return merged
+
+    def render_aggregate(self):
+        merged = self.aggregate()
+        return "".join(metric.render(merged[metric.name]) for metric in self.metrics)
+
+    def render(self):
+        self.collect_server_state()
+        return "".join(metric.render() for metric in self.metrics)
+
+    async def handle(self, request):
+        if self.multiprocess_dir:
+            # The own snapshot is taken on the loop, the files of the other
+            # workers are read in the executor.
+            self.write_snapshot()
+            text = await asyncio.get_event_loop().run_in_executor(
+                None, self.render_aggregate)
+        else:
+            text = self.render()
+        return TextResponse(text, content_type=CONTENT_TYPE)
+
+
+__all__ = [
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Metrics",
+]
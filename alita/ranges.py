@@ -0,0 +1,183 @@
+import os
+import binascii
+from alita.exceptions import RequestedRangeNotSatisfiable
+from alita.helpers import parse_etags, parse_http_date
+
+# Coalesced ranges beyond this count are answered with the whole entity.
+MAX_RANGES = 16
+
+
+class ContentRange:
+    """
+    One satisfiable byte range of an entity of ``total`` bytes, ``end``
+    is inclusive like in the ``Content-Range`` header.
+    """
+    __slots__ = ("start", "end", "total")
+
+    def __init__(self, start, end, total):
+        self.start = start
+        self.end = end
+        self.total = total
+
+    @property
+    def size(self):
+        return self.end - self.start + 1
+
+    def to_header(self):
+        return "bytes %d-%d/%d" % (self.start, self.end, self.total)
+
+    def __eq__(self, other):
+        return isinstance(other, ContentRange) and \
+            (self.start, self.end, self.total) == (other.start, other.end, other.total)
+
+    def __repr__(self):
+        return "<ContentRange %s>" % self.to_header()
+
+
+class Range:
+    """
+    A parsed ``Range`` request header.  ``ranges`` holds ``(first, last)``
+    pairs where ``first`` is ``None`` for suffix ranges and ``last`` is
+    ``None`` for open ranges.
+    """
+    __slots__ = ("units", "ranges")
+
+    def __init__(self, units, ranges):
+        self.units = units
+        self.ranges = ranges
+
+    @classmethod
+    def from_header(cls, value):
+        """
+        Parse a ``Range`` header, return ``None`` when it is malformed so
+        that the header is ignored as required by RFC 7233.
+        """
+        if not value or "=" not in value:
+            return None
+        units, _, specs = value.partition("=")
+        units = units.strip().lower()
+        ranges = []
+        for spec in specs.split(","):
+            spec = spec.strip()
+            if not spec:
+                continue
+            first, sep, last = spec.partition("-")
+            first, last = first.strip(), last.strip()
+            if not sep or not (first or last):
+                return None
+            if first and not first.isdigit() or last and not last.isdigit():
+                return None
+            if not first:
+                ranges.append((None, int(last)))
+                continue
+            first = int(first)
+            last = int(last) if last else None
+            if last is not None and last < first:
+                return None
+            ranges.append((first, last))
+        if not ranges:
+            return None
+        return cls(units, ranges)
+
+    def resolve(self, length):
+        """
+        Return the sorted and coalesced :class:`ContentRange` list for an
+        entity of ``length`` bytes, ``None`` when the whole entity should
+        be sent instead.
+
+        :raises RequestedRangeNotSatisfiable: no range overlaps the entity.
+        """
+        if self.units != "bytes":
+            return None
+        resolved = []
+        for first, last in self.ranges:
+            if first is None:
+                if last == 0:
+                    continue
+                first, last = max(length - last, 0), length - 1
+            elif first >= length:
+                continue
+            elif last is None or last >= length:
+                last = length - 1
+            resolved.append([first, last])
+        if not resolved:
+            raise RequestedRangeNotSatisfiable(length)
+        resolved.sort()
+        merged = [resolved[0]]
+        for first, last in resolved[1:]:
+            if first <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], last)
+            else:
+                merged.append([first, last])
+        if len(merged) > MAX_RANGES:
+            return None
+        return [ContentRange(first, last, length) for first, last in merged]
+
+    def __repr__(self):
+        return "<Range %s=%s>" % (self.units, ",".join(
+            "%s-%s" % ("" if first is None else first, "" if last is None else last)
+            for first, last in self.ranges))
+
+
+def if_range_matches(if_range, etag=None, last_modified=None):
+    """
+    Evaluate an ``If-Range`` header against the current validators of the
+    entity.  A missing header always matches.
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(("W/", '"')):
+        if etag is None:
+            return False
+        # Entity tags are compared without their weak prefix since the
+        # static file tags change with every modification.
+        return bool(parse_etags(etag) & parse_etags(if_range))
+    if last_modified is None:
+        return False
+    return parse_http_date(if_range) == last_modified
+
+
+class MultipartByteranges:
+    """
+    Framing of a ``multipart/byteranges`` body, the parts themselves are
+    copied from the file by the response.
+    """
+    __slots__ = ("ranges", "boundary", "headers")
+
+    def __init__(self, ranges, content_type):
+        self.ranges = ranges
+        self.boundary = binascii.hexlify(os.urandom(12)).decode()
+        self.headers = [
+            ("\r\n--%s\r\nContent-Type: %s\r\nContent-Range: %s\r\n\r\n" % (
+                self.boundary, content_type, content_range.to_header()
+            )).encode("latin-1")
+            for content_range in ranges
+        ]
+        # The first delimiter is not preceded by a line break.
+        self.headers[0] = self.headers[0][2:]
+
+    @property
+    def content_type(self):
+        return "multipart/byteranges; boundary=%s" % self.boundary
+
+    @property
+    def closing(self):
+        return ("\r\n--%s--\r\n" % self.boundary).encode("latin-1")
+
+    @property
+    def content_length(self):
+        return sum(len(header) for header in self.headers) + \
+            sum(content_range.size for content_range in self.ranges) + \
+            len(self.closing)
+
+    def __iter__(self):
+        return iter(zip(self.headers, self.ranges))
+
+
+__all__ = [
+    "ContentRange",
+    "Range",
+    "MultipartByteranges",
+    "if_range_matches",
+]
@@ -1,7 +1,7 @@
-import json
-import itertools
 from alita.base import BaseRequest
 from alita.helpers import cached_property
+from alita.ranges import Range
+from alita.sessions import LazySession
 from alita.datastructures import MultiDict
 from alita.exceptions import BadRequest, BadRequestKeyError, RequestEntityTooLarge
 
@@ -39,7 +39,7 @@ class JSONMixin(object):
             return None
 
         try:
-            rv = json.loads(data)
+            rv = self.app.json.loads(data)
         except ValueError as e:
             if silent:
                 rv = None
@@ -61,11 +61,16 @@ class JSONMixin(object):
 
 
 class Request(BaseRequest, JSONMixin):
-    route_match = None
-    routing_exception = None
+    __slots__ = ("route_match", "routing_exception", "_cached_json", "_session", "timer")
 
     def __init__(self, app, environ, headers=None):
         super().__init__(app, environ, headers)
+        self.route_match = None
+        self.routing_exception = None
+        self._cached_json = (Ellipsis, Ellipsis)
+        self._session = None
+        # Phase timer of the request when metrics are enabled.
+        self.timer = None
         self.match_request()
 
     @cached_property
@@ -77,15 +82,66 @@ class Request(BaseRequest, JSONMixin):
 
     def match_request(self):
         try:
-            if self.app.max_content_length and len(self.body) > \
-                    self.app.max_content_length:
-                raise RequestEntityTooLarge()
+            self.check_content_length()
             self.route_match = self.app.router.match(self)
         except self.app.exception_class as ex:
             self.routing_exception = ex
         except Exception as ex:
             self.routing_exception = BadRequest(str(ex))
 
+    def check_content_length(self):
+        max_content_length = self.app.max_content_length
+        if not max_content_length:
+            return
+        content_length = self.headers.get('content-length')
+        if content_length and content_length.isdigit() and \
+                int(content_length) > max_content_length:
+            raise RequestEntityTooLarge()
+        stream = self.environ.get("stream")
+        if stream is not None:
+            stream.limit = max_content_length
+
+    async def stream(self):
+        stream = self.environ.get("stream")
+        async for chunk in super().stream():
+            yield chunk
+        if stream is not None and stream.exceeded:
+            raise RequestEntityTooLarge()
+
+    @property
+    def is_stream(self):
+        """
+        Whether the view reads the body itself through :meth:`stream`.
+        """
+        return self.endpoint in self.app.stream_endpoints
+
+    @cached_property
+    def range(self):
+        """
+        The parsed ``Range`` header as :class:`~alita.ranges.Range`, ``None``
+        when it is missing or malformed.  Ranges only apply to ``GET``.
+        """
+        if self.method != 'GET':
+            return None
+        return Range.from_header(self.headers.get('range'))
+
+    @property
+    def session(self):
+        """
+        The session awaitable, ``session = await request.session`` loads it
+        from the session engine on first use only.
+        """
+        if self._session is None:
+            self._session = LazySession(self)
+        return self._session
+
+    @property
+    def loaded_session(self):
+        """
+        The session if it was loaded during this request, else ``None``.
+        """
+        return self._session.session if self._session is not None else None
+
     @property
     def endpoint(self):
         return self.route_match.endpoint if self.route_match else None
@@ -99,13 +155,10 @@ class Request(BaseRequest, JSONMixin):
             return self.route_match.endpoint.rsplit('.', 1)[0]
 
     async def update_template_context(self, context):
-        funcs = self.app.template_context_processors[None]
-        bp = self.blueprint
-        if bp is not None and bp in self.app.template_context_processors:
-            funcs = itertools.chain(funcs, self.app.template_context_processors[bp])
         orig_ctx = context.copy()
-        for func in funcs:
-            data = await self.app.get_awaitable_result(func, self)
+        for func, is_coroutine in self.app.get_hooks(
+                "template_context_processors", self.blueprint):
+            data = await func(self) if is_coroutine else func(self)
             if not isinstance(data, dict):
                 continue
             context.update(data)
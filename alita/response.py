@@ -2,14 +2,10 @@ import os
 import mimetypes
 from urllib.parse import quote_plus
 from alita.base import BaseResponse
+from alita.ranges import MultipartByteranges
+from alita.json_provider import default_provider
 from aiofiles import open as open_async
 
-try:
-    from ujson import dumps as json_dumps
-except:
-    from json import dumps
-    json_dumps = dumps
-
 
 class HTTPResponse(BaseResponse):
     pass
@@ -41,11 +37,13 @@ class TextResponse(HTTPResponse):
 
 class JsonResponse(HTTPResponse):
     """
-    Returns response object with body in json format.
+    Returns response object with body in json format, ``dumps`` defaults
+    to the fastest installed JSON library.
     """
-    def __init__(self, body, status=200, headers=None, content_type="application/json"):
+    def __init__(self, body, status=200, headers=None, content_type="application/json",
+                 dumps=None):
         if isinstance(body, (dict, list)):
-            body = json_dumps(body)
+            body = (dumps or default_provider.dumps)(body)
         super().__init__(body, status, headers, content_type)
 
 
@@ -61,13 +59,23 @@ class RedirectResponse(HTTPResponse):
 
 
 class StreamHTTPResponse(BaseResponse):
+    compressible = True
+
     def __init__(self, stream_fn, status=200, headers=None, content_type="text/plain"):
         self.stream_fn = stream_fn
+        self.encoder = None
         super().__init__('', status, headers, content_type)
 
     async def write(self, data):
         data = self._encode_body(data)
+        if self.encoder is not None:
+            data = self.encoder.compress(data)
+        # An empty chunk would end the chunked body.
+        if not data:
+            return
         self._protocol.push_data(b"%x\r\n%b\r\n" % (len(data), data))
+        # A stream that keeps writing is not cut off by response_timeout.
+        self._protocol.extend_response_timeout()
         await self._protocol.drain()
 
     async def output(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
@@ -76,11 +84,35 @@ class StreamHTTPResponse(BaseResponse):
                                "stream response can not execute.")
         self.headers["Transfer-Encoding"] = "chunked"
         self.headers.pop("Content-Length", None)
-        headers = super().output(version, keep_alive, keep_alive_timeout)
+        headers = self.get_headers(version, keep_alive, keep_alive_timeout)
         self._protocol.push_data(headers)
         await self._protocol.drain()
         await self.stream_fn(self)
+        if self.encoder is not None:
+            data = self.encoder.flush()
+            if data:
+                self._protocol.push_data(b"%x\r\n%b\r\n" % (len(data), data))
         self._protocol.push_data(b"0\r\n\r\n")
+        return b""
+
+    async def head(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        # The stream is not run, its length is unknown.
+        self.headers["Transfer-Encoding"] = "chunked"
+        self.headers.pop("Content-Length", None)
+        return self.get_headers(version, keep_alive, keep_alive_timeout)
+
+
+def split_range(_range, mime_type):
+    """
+    Normalize the ``_range`` argument of the file responses: a single
+    :class:`~alita.ranges.ContentRange` or a list of them, which is sent
+    as ``multipart/byteranges``.
+    """
+    if isinstance(_range, (list, tuple)):
+        if len(_range) > 1:
+            return None, MultipartByteranges(_range, mime_type)
+        _range = _range[0] if _range else None
+    return _range, None
 
 
 class FileResponse(HTTPResponse):
@@ -88,27 +120,75 @@ class FileResponse(HTTPResponse):
     Returns response object with output file.
     """
     def __init__(self, location, mime_type=None, filename=None,
-                 _range=None, status=200, headers=None):
+                 _range=None, status=200, headers=None, use_sendfile=True):
         headers = headers or {}
         if filename:
             headers["Content-Disposition"] = f'attachment; filename="{filename}"'
-        self._range = _range
         self.location = location
+        self.use_sendfile = use_sendfile
         self.filename = filename or os.path.split(self.location)[-1]
         self.mime_type = mime_type or mimetypes.guess_type(self.filename)[0] or "text/plain"
-        super().__init__('', status, headers, self.mime_type)
+        self._range, self.multipart = split_range(_range, self.mime_type)
+        content_type = self.multipart.content_type if self.multipart else self.mime_type
+        super().__init__('', status, headers, content_type)
+
+    def set_range_headers(self):
+        if self.multipart:
+            self.headers["Content-Length"] = self.multipart.content_length
+            self.status = 206
+        elif self._range:
+            self.headers["Content-Range"] = self._range.to_header()
+            self.headers["Content-Length"] = self._range.size
+            self.status = 206
+
+    async def sendfile(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        """
+        Write the headers and let the protocol copy the file to the socket.
+        """
+        self.set_range_headers()
+        with open(self.location, mode="rb") as _file:
+            size = os.fstat(_file.fileno()).st_size
+            if not self._range and not self.multipart:
+                # The body is the whole file, whatever Content-Length was given.
+                self.headers["Content-Length"] = size
+            self._protocol.push_data(self.get_headers(
+                version,
+                keep_alive,
+                keep_alive_timeout
+            ))
+            if self.multipart:
+                for header, content_range in self.multipart:
+                    self._protocol.push_data(header)
+                    await self._protocol.sendfile(_file, content_range.start, content_range.size)
+                self._protocol.push_data(self.multipart.closing)
+            elif self._range:
+                await self._protocol.sendfile(_file, self._range.start, self._range.size)
+            else:
+                await self._protocol.sendfile(_file, 0, size)
+        return b""
+
+    async def head(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        self.set_range_headers()
+        if not self._range and not self.multipart:
+            self.headers["Content-Length"] = os.stat(self.location).st_size
+        return self.get_headers(version, keep_alive, keep_alive_timeout)
 
     async def output(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        if self.use_sendfile and self.has_protocol():
+            return await self.sendfile(version, keep_alive, keep_alive_timeout)
+        self.set_range_headers()
         async with open_async(self.location, mode="rb") as _file:
-            if self._range:
+            if self.multipart:
+                parts = []
+                for header, content_range in self.multipart:
+                    await _file.seek(content_range.start)
+                    parts.append(header)
+                    parts.append(await _file.read(content_range.size))
+                parts.append(self.multipart.closing)
+                out_stream = b"".join(parts)
+            elif self._range:
                 await _file.seek(self._range.start)
                 out_stream = await _file.read(self._range.size)
-                self.headers["Content-Range"] = "bytes %s-%s/%s" % (
-                    self._range.start,
-                    self._range.end,
-                    self._range.total,
-                )
-                self.status = 206
             else:
                 out_stream = await _file.read()
         self.body = self._encode_body(out_stream)
@@ -124,29 +204,51 @@ class StreamResponse(StreamHTTPResponse):
         headers = headers or {}
         if filename:
             headers["Content-Disposition"] = f'attachment; filename="{filename}"'
-        self._range = _range
         self.location = location
         self.chunk_size = chunk_size
         self.filename = filename or os.path.split(self.location)[-1]
         self.mime_type = mime_type or mimetypes.guess_type(self.filename)[0] or "text/plain"
-        super().__init__(None, status, headers, self.mime_type)
+        self._range, self.multipart = split_range(_range, self.mime_type)
+        content_type = self.multipart.content_type if self.multipart else self.mime_type
+        super().__init__(None, status, headers, content_type)
+
+    async def copy(self, response, _file, start, size):
+        """
+        Write ``size`` bytes from ``start`` chunk by chunk.
+        """
+        await _file.seek(start)
+        while size > 0:
+            content = await _file.read(min(size, self.chunk_size))
+            if len(content) < 1:
+                break
+            size -= len(content)
+            await response.write(content)
+
+    def set_range_headers(self):
+        if self.multipart:
+            self.status = 206
+        elif self._range:
+            self.headers["Content-Range"] = self._range.to_header()
+            self.status = 206
+
+    async def head(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        self.set_range_headers()
+        return await super().head(version, keep_alive, keep_alive_timeout)
 
     async def output(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
         _file = await open_async(self.location, mode="rb")
+        self.set_range_headers()
 
         async def _stream_fn(response):
             nonlocal _file
             try:
-                if self._range:
-                    chunk_size = min((self._range.size, self.chunk_size))
-                    await _file.seek(self._range.start)
-                    to_send = self._range.size
-                    while to_send > 0:
-                        content = await _file.read(chunk_size)
-                        if len(content) < 1:
-                            break
-                        to_send -= len(content)
-                        await response.write(content)
+                if self.multipart:
+                    for header, content_range in self.multipart:
+                        await response.write(header)
+                        await self.copy(response, _file, content_range.start, content_range.size)
+                    await response.write(self.multipart.closing)
+                elif self._range:
+                    await self.copy(response, _file, self._range.start, self._range.size)
                 else:
                     while True:
                         content = await _file.read(self.chunk_size)
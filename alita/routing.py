@@ -1,9 +1,9 @@
 import re
-import attr
 from enum import Enum
+from collections import OrderedDict
 from alita.base import BaseRoute, BaseRouter
 from alita.converters import CONVERTER_TYPES
-from urllib.parse import urljoin, quote
+from urllib.parse import urljoin, quote, urlencode
 from alita.helpers import get_request_url, set_query_parameter
 from alita.exceptions import NotFound, BadRequest, RequestSlash, RequestRedirect
 from alita.response import RedirectResponse
@@ -54,12 +54,36 @@ class URLPath:
             raise ValueError('base_url or request need supply one.')
 
 
-@attr.s
 class RouteMatch:
-    status = attr.ib(validator=attr.validators.instance_of(Match))
-    endpoint = attr.ib(validator=attr.validators.instance_of(str))
-    view_func = attr.ib()
-    path_params = attr.ib(validator=attr.validators.instance_of(dict))
+    """
+    Result of a route match, created for every request so it does not
+    validate its fields; the router calls :meth:`validate` in debug mode.
+    """
+    __slots__ = ("status", "endpoint", "view_func", "path_params")
+
+    def __init__(self, status, endpoint, view_func, path_params):
+        self.status = status
+        self.endpoint = endpoint
+        self.view_func = view_func
+        self.path_params = path_params
+
+    def validate(self):
+        for name, expected in (("status", Match), ("endpoint", str), ("path_params", dict)):
+            value = getattr(self, name)
+            if not isinstance(value, expected):
+                raise TypeError("'%s' must be %r (got %r that is a %r)." % (
+                    name, expected, value, type(value)))
+        return self
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.status, self.endpoint, self.view_func, self.path_params) == \
+            (other.status, other.endpoint, other.view_func, other.path_params)
+
+    def __repr__(self):
+        return "RouteMatch(status=%r, endpoint=%r, view_func=%r, path_params=%r)" % (
+            self.status, self.endpoint, self.view_func, self.path_params)
 
 
 class Route(BaseRoute):
@@ -76,6 +100,7 @@ class Route(BaseRoute):
             self.methods |= set(["HEAD"])
         self.rule = self.is_leaf and self.path or self.path.rstrip('/')
         self.path_regex, self.path_format, self.param_converters = self.compile_path()
+        self.url_builder = self.compile_builder()
 
     def compile_path(self):
         path_regex = ""
@@ -105,14 +130,54 @@ class Route(BaseRoute):
         )
         return re.compile(regex), path_format, param_converters
 
+    def compile_builder(self):
+        """
+        Split :attr:`path_format` into ``(text, param name, converter)``
+        parts, ``text`` preceding each parameter, used by :meth:`build`.
+        """
+        parts = []
+        idx = 0
+        for match in PARAM_REGEX.finditer(self.rule):
+            param_name = match.group(1)
+            parts.append((self.rule[idx: match.start()], param_name,
+                          self.param_converters[param_name]))
+            idx = match.end()
+        return tuple(parts), self.rule[idx:]
+
+    def build(self, path_params):
+        """
+        Return the path of this route for ``path_params``, parameters
+        not in the rule are appended as query string.  ``None`` when a rule
+        parameter is missing.
+        """
+        parts, tail = self.url_builder
+        if not parts:
+            path = tail
+        else:
+            chunks = []
+            for text, name, converter in parts:
+                try:
+                    value = path_params[name]
+                except KeyError:
+                    return None
+                chunks.append(text)
+                chunks.append(converter.to_string(value))
+            chunks.append(tail)
+            path = "".join(chunks)
+        if len(path_params) > len(parts):
+            params = self.param_converters
+            path += "?" + urlencode(
+                [(key, value) for key, value in path_params.items() if key not in params])
+        return path
+
     def match(self, request):
         if request.scheme in ("http", "https", "wss", "ws"):
             match = self.path_regex.search(request.path)
             if not match:
                 raise NoMatchFound()
             matched_params = match.groupdict()
-            if self.strict_slashes and not self.is_leaf and \
-                    not matched_params.pop('__suffix__'):
+            suffix = matched_params.pop('__suffix__', None)
+            if self.strict_slashes and not self.is_leaf and not suffix:
                 raise RequestSlash()
             for key, value in matched_params.items():
                 matched_params[key] = self.param_converters[key].convert(value)
@@ -130,14 +195,14 @@ class Route(BaseRoute):
             raise NoMatchFound()
 
     def url_path_for(self, endpoint, **path_params):
-        seen_keys = set(path_params.keys())
-        expected_keys = set(self.param_converters.keys())
         if endpoint != self.endpoint:
             raise NoMatchFound()
-        if expected_keys and not seen_keys.issuperset(expected_keys):
+        path = self.build(path_params)
+        if path is None:
             raise NoMatchFound()
-        path = replace_params(self.path_format, self.param_converters, path_params)
-        return URLPath(path=path, protocol="http", params=path_params)
+        params = {key: value for key, value in path_params.items()
+                  if key not in self.param_converters}
+        return URLPath(path=path, protocol="http", params=params)
 
     def __eq__(self, other):
         return (
@@ -149,9 +214,26 @@ class Route(BaseRoute):
 
 
 class Router(BaseRouter):
+    """
+    Matches the routes in registration order.  With ``ROUTE_CACHE_SIZE``
+    the successful matches are kept in a LRU keyed by method, scheme and
+    path, the cached :class:`RouteMatch` is shared by the requests and
+    must not be modified.
+
+    URLs are built from the routes indexed by endpoint, with
+    ``URL_FOR_CACHE`` the URLs of endpoints called without parameters are
+    kept as well.
+    """
     def __init__(self, app, routes=None):
         self.app = app
-        self.routes = routes or []
+        self.routes = []
+        self.endpoints = {}
+        self.url_cache = {}
+        self.match_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        for route in routes or []:
+            self.insert_route(route)
 
     def add_route(self, path, endpoint, view_func, methods=None, strict_slashes=None):
         if strict_slashes is None:
@@ -163,9 +245,52 @@ class Router(BaseRouter):
             methods=methods,
             strict_slashes=strict_slashes
         )
+        self.insert_route(route)
+
+    def insert_route(self, route):
         self.routes.append(route)
+        self.endpoints.setdefault(route.endpoint, []).append(route)
+        self.clear_cache()
+
+    def clear_cache(self):
+        self.match_cache.clear()
+        self.url_cache.clear()
+
+    def cache_info(self):
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self.match_cache),
+            "maxsize": self.app.config.get("ROUTE_CACHE_SIZE") or 0,
+            "hit_rate": self.cache_hits / lookups if lookups else 0.0,
+        }
 
     def match(self, request):
+        max_size = self.app.config.get("ROUTE_CACHE_SIZE")
+        if not max_size:
+            return self.match_route(request)
+        key = (request.method, request.scheme, request.path)
+        cache = self.match_cache
+        route_match = cache.get(key)
+        if route_match is not None:
+            cache.move_to_end(key)
+            self.cache_hits += 1
+            return route_match
+        self.cache_misses += 1
+        route_match = self.match_route(request)
+        cache[key] = route_match
+        if len(cache) > max_size:
+            cache.popitem(last=False)
+        return route_match
+
+    def match_route(self, request):
+        route_match = self._match(request)
+        if self.app.debug:
+            route_match.validate()
+        return route_match
+
+    def _match(self, request):
         for route in self.routes:
             try:
                 route_math = route.match(request)
@@ -181,9 +306,157 @@ class Router(BaseRouter):
         raise NoMatchFound()
 
     def url_path_for(self, endpoint, **path_params):
-        for route in self.routes:
+        for route in self.endpoints.get(endpoint, ()):
             try:
                 return route.url_path_for(endpoint, **path_params)
             except NoMatchFound:
                 pass
         raise NoMatchFound()
+
+    def url_for(self, endpoint, **path_params):
+        if not path_params:
+            url = self.url_cache.get(endpoint)
+            if url is not None:
+                return url
+        for route in self.endpoints.get(endpoint, ()):
+            path = route.build(path_params)
+            if path is not None:
+                break
+        else:
+            raise NoMatchFound()
+        # Same result as URLPath.make_url, which resolves dot segments.
+        if path[:1] != "/" or path[:2] == "//" or "/." in path:
+            url = urljoin("/", path)
+        else:
+            url = path
+        if not path_params and self.app.config.get("URL_FOR_CACHE"):
+            self.url_cache[endpoint] = url
+        return url
+
+
+class RouteNode:
+    """
+    One path segment of the :class:`TreeRouter` prefix tree.
+    """
+    __slots__ = ("static", "params", "routes", "complex_routes")
+
+    def __init__(self):
+        # segment text -> child node
+        self.static = {}
+        # converter type -> (compiled segment regex, converter, child node)
+        self.params = {}
+        # (index, route, param names) of routes ending at this node
+        self.routes = []
+        # (index, route) of routes whose remaining rule can not be split
+        # into plain segments, they are verified with the route regex.
+        self.complex_routes = []
+
+
+class TreeRouter(Router):
+    """
+    Router that keeps the routes in a prefix tree keyed by path segments.
+
+    Static segments are resolved with dict lookups and converters only run
+    at parameter nodes, so matching does not depend on the number of
+    registered routes.  Routes are still decided in registration order,
+    exactly like :class:`Router`.
+    """
+
+    def __init__(self, app, routes=None):
+        self.root = RouteNode()
+        super().__init__(app, routes)
+
+    def insert_route(self, route):
+        index = len(self.routes)
+        super().insert_route(route)
+        node = self.root
+        param_names = []
+        for segment in self.split_rule(route.rule):
+            match = PARAM_REGEX.fullmatch(segment)
+            if match is None and "<" not in segment:
+                node = node.static.setdefault(segment, RouteNode())
+                continue
+            if match is not None:
+                param_name, converter_type = match.groups("str")
+                converter_type = converter_type.lstrip(":")
+                converter = route.param_converters[param_name]
+                if converter.part_isolating:
+                    if converter_type not in node.params:
+                        node.params[converter_type] = (
+                            re.compile(converter.regex), converter, RouteNode())
+                    node = node.params[converter_type][2]
+                    param_names.append(param_name)
+                    continue
+            node.complex_routes.append((index, route))
+            return
+        node.routes.append((index, route, tuple(param_names)))
+
+    @staticmethod
+    def split_rule(rule):
+        return rule[1:].split("/") if rule else []
+
+    def collect_candidates(self, node, segments, position, values, candidates):
+        for index, route in node.complex_routes:
+            candidates.append((index, route, None, None))
+        remain = len(segments) - position
+        if remain == 0:
+            for index, route, names in node.routes:
+                candidates.append((index, route, names, (tuple(values), False)))
+            return
+        segment = segments[position]
+        if remain == 1 and not segment:
+            for index, route, names in node.routes:
+                candidates.append((index, route, names, (tuple(values), True)))
+        child = node.static.get(segment)
+        if child is not None:
+            self.collect_candidates(child, segments, position + 1, values, candidates)
+        for regex, converter, child in node.params.values():
+            if regex.fullmatch(segment):
+                values.append(segment)
+                self.collect_candidates(child, segments, position + 1, values, candidates)
+                values.pop()
+
+    def match_candidate(self, request, route, names, values, has_suffix):
+        """
+        Same outcome as :meth:`Route.match` for a route that the tree
+        already matched segment by segment.
+        """
+        if has_suffix:
+            if route.is_leaf and route.strict_slashes:
+                raise NoMatchFound()
+        elif route.strict_slashes and not route.is_leaf:
+            raise RequestSlash()
+        converters = route.param_converters
+        matched_params = {}
+        for name, value in zip(names, values):
+            matched_params[name] = converters[name].convert(value)
+        if route.methods and request.method not in route.methods:
+            status = Match.PARTIAL
+        else:
+            status = Match.FULL
+        return RouteMatch(status, route.endpoint, route.view_func, matched_params)
+
+    def _match(self, request):
+        if request.scheme not in ("http", "https", "wss", "ws"):
+            raise NoMatchFound()
+        candidates = []
+        path = request.path
+        self.collect_candidates(self.root, path[1:].split("/"), 0, [], candidates)
+        candidates.sort(key=lambda item: item[0])
+        for index, route, names, matched in candidates:
+            try:
+                if matched is None:
+                    route_math = route.match(request)
+                else:
+                    route_math = self.match_candidate(
+                        request, route, names, *matched)
+                if route_math.status == Match.PARTIAL:
+                    raise BadRequest()
+                return route_math
+            except NoMatchFound:
+                pass
+            except RequestSlash:
+                new_path = quote(path, safe='/:|+') + '/'
+                raise RequestRedirect(response=RedirectResponse(
+                    get_request_url(request, path=new_path)))
+        raise NoMatchFound()
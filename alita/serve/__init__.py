@@ -2,11 +2,13 @@ from alita.serve.server import Server
 from alita.serve.utils import STATUS_TEXT
 from alita.serve.config import ServerConfig
 from alita.serve.reloader import run_auto_reload
+from alita.serve.supervisor import Supervisor
 
 
 __all__ = [
     "Server",
     "STATUS_TEXT",
     "ServerConfig",
-    "run_auto_reload"
+    "run_auto_reload",
+    "Supervisor"
 ]
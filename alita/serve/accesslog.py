@@ -0,0 +1,133 @@
+import sys
+import json
+import time
+import atexit
+import random
+import threading
+from collections import deque
+
+ACCESS_LOG_FORMATS = ("text", "json")
+
+
+class AccessLog:
+    """
+    Access log written by a background thread.  The event loop only
+    appends a tuple to a ring of ``buffer_size`` records, the thread
+    formats and writes them in batches every ``flush_interval`` seconds or
+    as soon as half of the ring is used.  Records arriving while the ring
+    is full are counted in ``dropped`` instead of blocking the loop.
+
+    ``sample_rate`` keeps that fraction of the successful responses,
+    responses with a status of 500 or more are always logged.
+    """
+    def __init__(self, path=None, format="text", buffer_size=8192, flush_interval=1.0,
+                 sample_rate=1.0):
+        if format not in ACCESS_LOG_FORMATS:
+            raise ValueError("access_log_format must be one of %s." % ", ".join(ACCESS_LOG_FORMATS))
+        self.path = path
+        self.format = format
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self.records = deque()
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self._batch_size = max(1, buffer_size // 2)
+        self._second = None
+        self._timestamp = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._closed = False
+
+    def get_timestamp(self, now):
+        # strftime runs at most once per second.
+        second = int(now)
+        if second != self._second:
+            self._second = second
+            self._timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        return self._timestamp
+
+    def log(self, ip, method, path, status, duration):
+        if self.sample_rate < 1.0 and status < 500 and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            return
+        records = self.records
+        if len(records) >= self.buffer_size:
+            self.dropped += 1
+            return
+        records.append((self.get_timestamp(time.time()), ip, method, path, status, duration))
+        if self._thread is None:
+            self.start()
+        elif len(records) == self._batch_size:
+            self._wakeup.set()
+
+    def format_record(self, record):
+        timestamp, ip, method, path, status, duration = record
+        if self.format == "json":
+            return json.dumps({
+                "time": timestamp,
+                "ip": ip,
+                "method": method,
+                "path": path,
+                "status": status,
+                "duration_ms": round(duration * 1e3, 3),
+            }) + "\n"
+        return '[access] %s - - [%s] "%s %s" %s - %.3fms\n' % (
+            ip, timestamp, method, path, status, duration * 1e3)
+
+    def start(self):
+        if self._thread is not None or self._closed:
+            return
+        self._thread = threading.Thread(target=self.run, name="alita-access-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def run(self):
+        stream = open(self.path, "a", encoding="utf-8") if self.path else sys.stdout
+        try:
+            while not self._closed:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self.flush(stream)
+            self.flush(stream)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+    def flush(self, stream):
+        records = self.records
+        lines = []
+        while records:
+            lines.append(self.format_record(records.popleft()))
+        if lines:
+            try:
+                stream.write("".join(lines))
+                stream.flush()
+            except (OSError, ValueError):
+                return
+            self.written += len(lines)
+
+    def close(self):
+        """
+        Stop the writer thread after it flushed the pending records.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._wakeup.set()
+            self._thread.join()
+
+    def stats(self):
+        return {
+            "pending": len(self.records),
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+        }
+
+
+__all__ = [
+    "AccessLog",
+]
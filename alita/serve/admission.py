@@ -0,0 +1,252 @@
+import math
+import heapq
+import asyncio
+import itertools
+
+PRIORITIES = {
+    "critical": 0,
+    "high": 1,
+    "normal": 2,
+    "low": 3,
+}
+DEFAULT_PRIORITY = PRIORITIES["normal"]
+# Responses per window used to follow the latency without load.
+LATENCY_WINDOW = 100
+# Latency increase always tolerated, so that jitter of fast responses is
+# not taken for congestion.
+LATENCY_SLACK = 0.001
+
+
+class Waiter:
+    __slots__ = ("priority", "seq", "key", "future", "handle")
+
+    def __init__(self, priority, seq, key, future):
+        self.priority = priority
+        self.seq = seq
+        self.key = key
+        self.future = future
+        self.handle = None
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """
+    Admission control of the requests of one server state.
+
+    Requests are admitted while fewer than ``limit`` of them run, and
+    while fewer than ``endpoint_limits[endpoint]`` run for the endpoints
+    that have a limit.  The others wait in a queue of ``queue_size``
+    requests, ordered by priority then arrival, for at most
+    ``queue_timeout`` seconds.  A request is rejected at once when the
+    queue is full of requests of the same or a higher priority, or when
+    the expected wait already exceeds its deadline.
+
+    With ``adaptive`` the global limit follows the latency: it grows by one
+    per ``limit`` responses while responses stay within ``latency_tolerance``
+    times the latency without load, and is multiplied by ``backoff`` when
+    they are slower, between ``min_limit`` and the configured ``limit``.
+    """
+    def __init__(self, server_state, loop, limit=None, endpoint_limits=None, adaptive=False,
+                 min_limit=1, latency_tolerance=2.0, backoff=0.9, queue_size=128,
+                 queue_timeout=1.0, priority_header="X-Priority", retry_after=None):
+        self.server_state = server_state
+        self.loop = loop
+        self.limit = float(limit) if limit is not None else None
+        self.max_limit = self.limit
+        self.min_limit = min_limit
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self.adaptive = adaptive and limit is not None
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.priority_header = priority_header
+        self._priority_name = priority_header.lower().encode("latin-1") \
+            if priority_header else None
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.endpoint_inflight = dict.fromkeys(self.endpoint_limits, 0)
+        self.queue = []
+        self._seq = itertools.count()
+        # Latency average, latency without load and the current window.
+        self.latency = None
+        self.baseline = None
+        self._window_min = None
+        self._samples = 0
+        self._since_decrease = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.shed = 0
+
+    def get_priority(self, headers):
+        """
+        Priority class named by the ``priority_header`` of the raw
+        ``(lowercase name, value)`` header pairs of the environ.
+        """
+        name = self._priority_name
+        if name is None:
+            return DEFAULT_PRIORITY
+        for header, value in headers:
+            if header == name:
+                value = value.decode("latin-1").strip().lower()
+                return PRIORITIES.get(value, DEFAULT_PRIORITY)
+        return DEFAULT_PRIORITY
+
+    def get_retry_after(self):
+        """
+        Seconds a rejected client should wait, estimated from the queue
+        when ``retry_after`` is not set.
+        """
+        if self.retry_after is not None:
+            return self.retry_after
+        return max(1, math.ceil(self.estimate_wait(len(self.queue) + 1)))
+
+    def estimate_wait(self, position, key=None):
+        if self.latency is None:
+            return 0.0
+        limit = self.limit if key is None else self.endpoint_limits.get(key)
+        if not limit:
+            return 0.0
+        return position * self.latency / limit
+
+    def can_admit(self, key):
+        if key is None:
+            return self.limit is None or self.inflight < int(self.limit)
+        limit = self.endpoint_limits.get(key)
+        return limit is None or self.endpoint_inflight.get(key, 0) < limit
+
+    def take(self, key):
+        if key is None:
+            self.inflight += 1
+        else:
+            self.endpoint_inflight[key] = self.endpoint_inflight.get(key, 0) + 1
+        self.admitted += 1
+
+    def try_acquire(self, key=None):
+        # Queued requests are admitted first, a new request never
+        # overtakes a waiting one of the same key.
+        if self.queue:
+            self.dispatch()
+        if not self.can_admit(key):
+            return False
+        self.take(key)
+        return True
+
+    async def acquire(self, key=None, priority=DEFAULT_PRIORITY):
+        """
+        Take a slot for ``key`` (``None`` for the global limit), waiting in
+        the queue when needed.  Return ``False`` when the request is
+        rejected.
+        """
+        if self.try_acquire(key):
+            return True
+        if not self.queue_size or not self.queue_timeout:
+            return self.reject()
+        ahead = sum(1 for waiter in self.queue
+                    if waiter.key == key and waiter.priority <= priority)
+        if self.estimate_wait(ahead + 1, key) > self.queue_timeout:
+            return self.reject()
+        if len(self.queue) >= self.queue_size:
+            worst = max(self.queue)
+            if worst.priority <= priority:
+                return self.reject()
+            self.shed += 1
+            self.remove(worst, False)
+        waiter = Waiter(priority, next(self._seq), key, self.loop.create_future())
+        waiter.handle = self.loop.call_later(self.queue_timeout, self.expire, waiter)
+        heapq.heappush(self.queue, waiter)
+        try:
+            admitted = await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() \
+                    and waiter.future.result():
+                self.release(key)
+            elif waiter in self.queue:
+                self.remove(waiter, None)
+            raise
+        if not admitted:
+            return self.reject()
+        return True
+
+    def reject(self):
+        self.rejected += 1
+        self.server_state.rejected_requests += 1
+        return False
+
+    def remove(self, waiter, result):
+        self.queue.remove(waiter)
+        heapq.heapify(self.queue)
+        waiter.handle.cancel()
+        if result is not None and not waiter.future.done():
+            waiter.future.set_result(result)
+
+    def expire(self, waiter):
+        if waiter in self.queue:
+            self.expired += 1
+            self.remove(waiter, False)
+
+    def dispatch(self):
+        for waiter in sorted(self.queue):
+            if waiter.future.done():
+                self.remove(waiter, None)
+            elif self.can_admit(waiter.key):
+                self.take(waiter.key)
+                self.remove(waiter, True)
+
+    def release(self, key=None, latency=None, failed=False):
+        if key is None:
+            self.inflight -= 1
+            if latency is not None:
+                self.update_limit(latency, failed)
+        else:
+            self.endpoint_inflight[key] -= 1
+        if self.queue:
+            self.dispatch()
+
+    def update_limit(self, latency, failed=False):
+        average = self.latency
+        self.latency = latency if average is None else average + (latency - average) * 0.1
+        if not self.adaptive:
+            return
+        if self._window_min is None or latency < self._window_min:
+            self._window_min = latency
+        self._samples += 1
+        if self._samples >= LATENCY_WINDOW:
+            baseline = self.baseline
+            self.baseline = self._window_min if baseline is None else \
+                baseline + (self._window_min - baseline) * 0.2
+            self._window_min = None
+            self._samples = 0
+        self._since_decrease += 1
+        slow = self.baseline is not None and \
+            latency > self.baseline * self.latency_tolerance + LATENCY_SLACK
+        if failed or slow:
+            # At most one decrease per round of in-flight requests.
+            if self._since_decrease >= self.limit:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._since_decrease = 0
+        elif self.inflight + 1 >= self.limit / 2:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def stats(self):
+        return {
+            "limit": int(self.limit) if self.limit is not None else None,
+            "inflight": self.inflight,
+            "endpoint_inflight": dict(self.endpoint_inflight),
+            "waiting": len(self.queue),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "shed": self.shed,
+            "latency": self.latency,
+            "baseline": self.baseline,
+        }
+
+
+__all__ = [
+    "PRIORITIES",
+    "AdmissionController",
+]
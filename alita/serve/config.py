@@ -42,13 +42,27 @@ class ServerConfig:
         logger=None,
         uvloop=True,
         access_log=True,
+        access_log_path=None,
+        access_log_format="text",
+        access_log_buffer=8192,
+        access_log_flush_interval=1.0,
+        access_log_sample_rate=1.0,
         wsgi=False,
         debug=False,
         backlog=100,
         proxy_headers=False,
         root_path="",
         limit_concurrency=None,
+        admission_control=False,
+        adaptive_concurrency=False,
+        min_concurrency=1,
+        endpoint_limits=None,
+        admission_queue_size=128,
+        admission_queue_timeout=1.0,
+        priority_header="X-Priority",
+        retry_after=None,
         limit_max_requests=None,
+        keep_alive=True,
         timeout_keep_alive=5,
         timeout_notify=30,
         request_timeout=60,
@@ -66,6 +80,10 @@ class ServerConfig:
         ws_max_queue=2 ** 5,
         ws_read_limit=2 ** 16,
         ws_write_limit=2 ** 16,
+        write_buffer_high_water=2 ** 16,
+        write_buffer_low_water=None,
+        max_buffered_bytes=2 ** 26,
+        timer_resolution=1.0,
     ):
         self.host = host
         self.port = port
@@ -78,6 +96,13 @@ class ServerConfig:
         self.log_level = log_level
         self.logger = logger or get_logger(self.log_level)
         self.access_log = access_log
+        # Access log records are written by a background thread to
+        # access_log_path, stdout when it is not set.
+        self.access_log_path = access_log_path
+        self.access_log_format = access_log_format
+        self.access_log_buffer = access_log_buffer
+        self.access_log_flush_interval = access_log_flush_interval
+        self.access_log_sample_rate = access_log_sample_rate
         self.wsgi = wsgi
         self.debug = debug
         self.run_async = run_async
@@ -85,7 +110,19 @@ class ServerConfig:
         self.proxy_headers = proxy_headers
         self.root_path = root_path
         self.limit_concurrency = limit_concurrency
+        # With admission_control, limit_concurrency and endpoint_limits are
+        # enforced by an AdmissionController queueing the requests over the
+        # limits instead of answering 503 at once.
+        self.admission_control = admission_control
+        self.adaptive_concurrency = adaptive_concurrency
+        self.min_concurrency = min_concurrency
+        self.endpoint_limits = endpoint_limits
+        self.admission_queue_size = admission_queue_size
+        self.admission_queue_timeout = admission_queue_timeout
+        self.priority_header = priority_header
+        self.retry_after = retry_after
         self.limit_max_requests = limit_max_requests
+        self.keep_alive = keep_alive
         self.timeout_keep_alive = timeout_keep_alive
         self.timeout_notify = timeout_notify
         self.request_timeout = request_timeout
@@ -102,6 +139,16 @@ class ServerConfig:
         self.ws_max_queue = ws_max_queue
         self.ws_read_limit = ws_read_limit
         self.ws_write_limit = ws_write_limit
+        # Transport write buffer limits of every connection, and the cap on
+        # the bytes buffered by all the connections of the worker.
+        self.write_buffer_high_water = write_buffer_high_water
+        if write_buffer_low_water is None:
+            write_buffer_low_water = write_buffer_high_water // 4
+        self.write_buffer_low_water = write_buffer_low_water
+        self.max_buffered_bytes = max_buffered_bytes
+        # Granularity in seconds of the request, response and keep-alive
+        # timeouts.
+        self.timer_resolution = timer_resolution
 
 
 __all__ = [
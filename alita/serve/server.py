@@ -5,12 +5,18 @@ import signal
 import asyncio
 import functools
 import traceback
-from datetime import datetime
+from collections import deque
 from alita.serve.utils import *
+from alita.serve.timer import TimerWheel
+from alita.serve.accesslog import AccessLog
+from alita.serve.admission import AdmissionController
 from urllib.parse import unquote
 from websockets import handshake, InvalidHandshake, WebSocketCommonProtocol
 
 HIGH_WATER_LIMIT = 65536
+LOW_WATER_LIMIT = HIGH_WATER_LIMIT // 4
+MAX_PIPELINED_REQUESTS = 16
+SENDFILE_CHUNK_SIZE = 65536
 
 
 class ServiceUnavailable:
@@ -28,17 +34,23 @@ class ServiceUnavailable:
             return str(data or "").encode()
 
     async def __call__(self, environ, on_response):
-        on_response(self)
+        await on_response(self)
 
-    def output(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+    def set_protocol(self, protocol):
+        pass
+
+    async def output(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
         # This is all returned in a kind-of funky way
         # We tried to make this as fast as possible in pure python
-        body, timeout_header = b"", b""
+        body, timeout_header = self.body, b""
         if keep_alive and keep_alive_timeout is not None:
             timeout_header = b"Keep-Alive: %d\r\n" % keep_alive_timeout
         self.headers["Content-Type"] = self.headers.get(
             "Content-Type", self.content_type
         )
+        # Required on kept alive connections, the next pipelined request
+        # is read right after the body.
+        self.headers["Content-Length"] = str(len(body))
         headers = self._parse_headers()
         description = b'Service Unavailable'
 
@@ -54,6 +66,10 @@ class ServiceUnavailable:
             body,
         )
 
+    async def head(self, version="1.1", keep_alive=False, keep_alive_timeout=None):
+        output = await self.output(version, keep_alive, keep_alive_timeout)
+        return output[:len(output) - len(self.body)]
+
     def _parse_headers(self):
         headers = b""
         for name, value in self.headers.items():
@@ -70,6 +86,190 @@ class ServiceUnavailable:
         return headers
 
 
+class Environ:
+    """
+    Per-request state handed to the application, filled in by the protocol
+    while parsing.  Connection level values are read from the protocol
+    instead of being copied into every request.  The mapping interface
+    (``environ["path"]``, ``environ.get("body")``...) is kept for
+    compatibility; unknown keys are stored in a dict created on demand.
+    """
+    __slots__ = (
+        "protocol", "url", "parsed_url", "http_version", "path",
+        "query_string", "method", "expect_100_continue", "keep_alive",
+        "headers", "stream", "body", "admitted_at", "_extra",
+    )
+
+    def __init__(self, protocol, url, parsed_url, path, query_string,
+                 http_version="1.1"):
+        self.protocol = protocol
+        self.url = url
+        self.parsed_url = parsed_url
+        self.path = path
+        self.query_string = query_string
+        self.http_version = http_version
+        self.method = None
+        self.expect_100_continue = False
+        self.keep_alive = False
+        self.headers = None
+        self.stream = None
+        self.body = None
+        # Loop time at which the request took its global admission slot,
+        # None while it holds none.
+        self.admitted_at = None
+        self._extra = None
+
+    type = property(lambda self: self.protocol.DEFAULT_TYPE)
+    server = property(lambda self: self.protocol.server)
+    client = property(lambda self: self.protocol.client)
+    scheme = property(lambda self: self.protocol.scheme)
+    ip = property(lambda self: self.protocol.server[0])
+    port = property(lambda self: int(self.protocol.server[1]))
+    transport = property(lambda self: self.protocol.transport)
+    logger = property(lambda self: self.protocol.logger)
+    root_path = property(lambda self: self.protocol.root_path)
+    access_log = property(lambda self: self.protocol.access_log)
+    admission = property(lambda self: self.protocol.server_state.admission)
+    keep_alive_timeout = property(lambda self: self.protocol.keep_alive_timeout)
+    default_headers = property(lambda self: self.protocol.default_headers)
+
+    KEYS = frozenset(__slots__[:-1] + (
+        "type", "server", "client", "scheme", "ip", "port", "transport",
+        "logger", "root_path", "access_log", "keep_alive_timeout",
+        "default_headers", "admission",
+    ))
+
+    def __getitem__(self, key):
+        if key in self.KEYS:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.__slots__:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.KEYS or (self._extra is not None and key in self._extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return sorted(self.KEYS) + list(self._extra or ())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+class RequestStream:
+    """
+    Bounded buffer of request body chunks between the parser and the
+    application.  Reading from the transport is paused while more than
+    ``high_water`` bytes are buffered and resumed once the consumer has
+    drained the buffer below ``low_water``.
+    """
+    def __init__(self, protocol, high_water=HIGH_WATER_LIMIT, low_water=LOW_WATER_LIMIT):
+        self.protocol = protocol
+        self.high_water = high_water
+        self.low_water = low_water
+        self.chunks = deque()
+        self.buffered = 0
+        self.total = 0
+        self.complete = False
+        self.exceeded = False
+        self._limit = None
+        # Created only when the consumer has to wait for data.
+        self._waiter = None
+
+    @property
+    def limit(self):
+        return self._limit
+
+    @limit.setter
+    def limit(self, value):
+        """
+        Maximum number of body bytes, checked against the running total.
+        """
+        self._limit = value
+        if value is not None and self.total > value:
+            self.set_exceeded()
+
+    def _wakeup(self):
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def set_exceeded(self):
+        self.exceeded = True
+        self.chunks.clear()
+        self.buffered = 0
+        self.protocol.resume_reading()
+        self._wakeup()
+
+    def feed_data(self, data):
+        self.total += len(data)
+        if self.exceeded:
+            return
+        if self._limit is not None and self.total > self._limit:
+            self.set_exceeded()
+            return
+        self.chunks.append(data)
+        self.buffered += len(data)
+        if self.buffered > self.high_water:
+            self.protocol.pause_reading()
+        self._wakeup()
+
+    def feed_eof(self):
+        self.complete = True
+        self._wakeup()
+
+    async def read(self):
+        """
+        Return the next body chunk, ``b""`` once the body is complete.
+        """
+        while not self.chunks:
+            if self.complete or self.exceeded:
+                return b""
+            self._waiter = self.protocol.loop.create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        data = self.chunks.popleft()
+        self.buffered -= len(data)
+        if self.buffered <= self.low_water:
+            self.protocol.resume_reading()
+        return data
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        data = await self.read()
+        if not data:
+            raise StopAsyncIteration
+        return data
+
+
 class HttpProtocol(asyncio.Protocol):
     DEFAULT_TYPE = "http"
     DEFAULT_VERSION = "1.1"
@@ -80,23 +280,32 @@ class HttpProtocol(asyncio.Protocol):
         self.loop = config.loop
         self.logger = config.logger
         self.access_log = config.access_log and (self.logger.level <= logging.INFO)
+        self.access_logger = server_state.access_log
         self.protocol = config.protocol
         self.root_path = config.root_path
         self.limit_concurrency = config.limit_concurrency
+        self.limit_max_requests = config.limit_max_requests
+        self.keep_alive = config.keep_alive
         self.keep_alive_timeout = config.keep_alive_timeout
         self.debug = config.debug
 
-        # Timeouts
-        self._request_timeout_handler = None
-        self._response_timeout_handler = None
-        self.timeout_keep_alive_task = None
+        # Timeouts, enforced by the timer wheel of the server state from
+        # the start times of the current phase.
         self.timeout_keep_alive = config.timeout_keep_alive
+        self.request_started = None
+        self.response_started = None
+        self.response_deadline = None
+        self.last_activity = 0.0
 
         # Global state
         self.server_state = server_state
         self.connections = server_state.connections
         self.tasks = server_state.tasks
+        self.timer_wheel = server_state.timer_wheel
         self.default_headers = server_state.default_headers + config.default_headers
+        (self.raw_default_headers, self.default_header_lines,
+         self.default_header_names) = server_state.encode_default_headers(
+            config.default_headers)
 
         # Per-connection state
         self.transport = None
@@ -105,61 +314,104 @@ class HttpProtocol(asyncio.Protocol):
         self.scheme = None
         self.parser = None
         self.websocket = None
-        self.pipeline = []
+        self.closing = False
+        self.pipeline = deque()
+        self.requests_count = 0
+        self.current_environ = None
+        # Read side flow control: the transport stops reading while the
+        # request stream or the pipeline is full.
+        self.reading_paused = False
+        # Write side flow control: writers wait in drain() while the
+        # transport buffer is above its high water mark.
+        self.writing_paused = False
+        self.write_throttled = False
+        self.write_buffered = 0
+        self._drain_waiter = None
 
         # Per-request state
         self.url = None
         self.environ = None
-        self.body = b""
-        self.more_body = True
+        self.request_stream = None
         self.headers = []
         self.expect_100_continue = False
-        self.message_event = asyncio.Event()
-        self.message_event.set()
 
     # Protocol interface
     def connection_made(self, transport):
         self.connections.add(self)
+        self.server_state.total_connections += 1
         self.transport = transport
         self.server = get_local_addr(transport)
         self.client = get_remote_addr(transport)
         self.scheme = "https" if is_ssl(transport) else "http"
+        transport.set_write_buffer_limits(
+            high=self.config.write_buffer_high_water,
+            low=self.config.write_buffer_low_water,
+        )
 
         if self.logger.level <= logging.DEBUG:
             self.logger.debug("%s - Connected", self.client)
 
-        self._request_timeout_handler = self.loop.call_later(
-            self.config.request_timeout, self.request_timeout_callback
-        )
+        now = self.loop.time()
+        self.request_started = self.last_activity = now
+        self.timer_wheel.schedule(self, now + self.config.request_timeout, self.loop)
 
     def connection_lost(self, exc):
         self.connections.discard(self)
         if self.logger.level <= logging.DEBUG:
             self.logger.debug("%s - Disconnected", self.client)
-        self.message_event.set()
+        self.update_write_buffered(0)
+        self.writing_paused = False
+        self._wakeup_writer()
+        if self.request_stream is not None:
+            self.request_stream.feed_eof()
+        self.pipeline.clear()
+        self.timer_wheel.remove(self)
+
+    def get_timeout(self):
+        """
+        Return the ``(deadline, callback)`` of the current phase: response,
+        request or keep-alive idle time.
+        """
+        if self.transport is None:
+            return None
+        if self.current_environ is not None:
+            if self.response_deadline is None:
+                return None
+            return self.response_deadline, self.response_timeout_callback
+        if self.request_started is not None:
+            return (self.request_started + self.config.request_timeout,
+                    self.request_timeout_callback)
+        return self.last_activity + self.timeout_keep_alive, self.timeout_keep_alive_handler
 
     def request_timeout_callback(self):
-        self.shutdown()
+        self.close()
 
     def response_timeout_callback(self):
-        self.shutdown()
-
-    def cancel_timeout_keep_alive_task(self):
-        if self.timeout_keep_alive_task is not None:
-            self.timeout_keep_alive_task.cancel()
-            self.timeout_keep_alive_task = None
-        if self._request_timeout_handler is not None:
-            self._request_timeout_handler.cancel()
-            self._request_timeout_handler = None
-        if self._response_timeout_handler is not None:
-            self._response_timeout_handler.cancel()
-            self._response_timeout_handler = None
+        self.close()
+
+    def cancel_request_timeout(self):
+        self.request_started = None
+
+    def cancel_response_timeout(self):
+        """
+        Clear the response deadline, used by long-lived streaming responses.
+        """
+        self.response_deadline = None
+
+    def extend_response_timeout(self, timeout=None):
+        """
+        Move the response deadline to ``timeout`` seconds from now,
+        ``response_timeout`` by default.
+        """
+        self.response_deadline = self.loop.time() + (
+            self.config.response_timeout if timeout is None else timeout)
+        self.timer_wheel.schedule(self, self.response_deadline, self.loop)
 
     def data_received(self, data):
-        self.cancel_timeout_keep_alive_task()
+        self.last_activity = self.loop.time()
+        self.server_state.bytes_received += len(data)
         try:
             if self.parser is None:
-                self.headers = []
                 self.parser = httptools.HttpRequestParser(self)
             self.parser.feed_data(data)
         except httptools.parser.errors.HttpParserError as exc:
@@ -167,11 +419,25 @@ class HttpProtocol(asyncio.Protocol):
             if self.debug:
                 msg += "\n" + traceback.format_exc()
             self.logger.error(msg)
-            self.on_response(msg)
+            self.send_bad_request(msg)
         except httptools.HttpParserUpgrade as exc:
             #self.handle_upgrade()
             pass
 
+    def send_bad_request(self, msg):
+        content = [b"HTTP/1.1 400 Bad Request\r\n", self.raw_default_headers]
+        content.extend(
+            [
+                b"content-type: text/plain; charset=utf-8\r\n",
+                b"content-length: " + str(len(msg)).encode("ascii") + b"\r\n",
+                b"connection: close\r\n",
+                b"\r\n",
+                msg.encode("ascii"),
+            ]
+        )
+        self.transport.write(b"".join(content))
+        self.close()
+
     def handle_upgrade(self):
         upgrade_value = None
         for name, value in self.headers:
@@ -181,9 +447,7 @@ class HttpProtocol(asyncio.Protocol):
         if upgrade_value != b"websocket" or self.protocol is None:
             msg = "Unsupported upgrade request."
             self.logger.warning(msg)
-            content = [STATUS_TEXT[400]]
-            for name, value in self.default_headers:
-                content.extend([name, b": ", value, b"\r\n"])
+            content = [STATUS_TEXT[400], self.raw_default_headers]
             content.extend(
                 [
                     b"content-type: text/plain; charset=utf-8\r\n",
@@ -198,9 +462,9 @@ class HttpProtocol(asyncio.Protocol):
             return
 
         self.connections.discard(self)
-        method = self.environ["method"].encode()
+        method = self.environ.method.encode()
         output = [method, b" ", self.url, b" HTTP/1.1\r\n"]
-        for name, value in self.environ["headers"]:
+        for name, value in self.environ.headers:
             output += [name, b": ", value, b"\r\n"]
         output.append(b"\r\n")
         protocol = self.protocol(
@@ -213,6 +477,17 @@ class HttpProtocol(asyncio.Protocol):
         self.transport.set_protocol(protocol)
 
     # Parser callbacks
+    def on_message_begin(self):
+        self.url = None
+        self.environ = None
+        self.request_stream = None
+        self.headers = []
+        self.expect_100_continue = False
+        if self.request_started is None:
+            self.request_started = self.loop.time()
+            self.timer_wheel.schedule(
+                self, self.request_started + self.config.request_timeout, self.loop)
+
     def on_url(self, url):
         parsed_url = httptools.parse_url(url)
         path = parsed_url.path.decode("ascii")
@@ -220,140 +495,392 @@ class HttpProtocol(asyncio.Protocol):
             path = unquote(path)
         self.url = url
         self.expect_100_continue = False
-        self.environ = {
-            "url": url.decode(),
-            "parsed_url": parsed_url,
-            "type": self.DEFAULT_TYPE,
-            "http_version": self.DEFAULT_VERSION,
-            "server": self.server,
-            "client": self.client,
-            "scheme": self.scheme,
-            "ip": self.server[0],
-            "port": int(self.server[1]),
-            "path": path,
-            "query_string": (parsed_url.query if parsed_url.query else b"").decode(),
-        }
+        self.environ = Environ(
+            self,
+            url.decode(),
+            parsed_url,
+            path,
+            parsed_url.query.decode() if parsed_url.query else "",
+        )
 
     def on_header(self, name: bytes, value: bytes):
+        # Raw header pairs, decoded into a multidict only when the request
+        # headers are accessed.
         name = name.lower()
         if name == b"expect" and value.lower() == b"100-continue":
             self.expect_100_continue = True
-        self.headers.append((name.decode("ascii"), value.decode("ascii")))
+        self.headers.append((name, value))
 
     def on_headers_complete(self):
+        environ = self.environ
         http_version = self.parser.get_http_version()
         if http_version != self.DEFAULT_VERSION:
-            self.environ["http_version"] = http_version
-        self.environ.update(
-            protocol=self,
-            method=self.parser.get_method().decode("ascii"),
-            transport=self.transport,
-            logger=self.logger,
-            root_path=self.root_path,
-            access_log=self.access_log,
-            expect_100_continue=self.expect_100_continue,
-            keep_alive=http_version != "1.0",
-            keep_alive_timeout=self.keep_alive_timeout,
-            headers=self.headers,
-            default_headers=self.default_headers,
-        )
-    
+            environ.http_version = http_version
+        environ.method = self.parser.get_method().decode("ascii")
+        environ.expect_100_continue = self.expect_100_continue
+        environ.keep_alive = self.keep_alive and self.parser.should_keep_alive()
+        environ.headers = self.headers
+        self.request_stream = RequestStream(self)
+        environ.stream = self.request_stream
+        # The application is started as soon as the headers are parsed and
+        # reads the body from the stream.
+        if self.current_environ is None:
+            self.process_request(self.environ)
+            return
+        # A response is still being written on this connection, answer
+        # the pipelined request once it has been sent.
+        self.pipeline.append(self.environ)
+        self.server_state.pipelined_requests += 1
+        if len(self.pipeline) >= MAX_PIPELINED_REQUESTS:
+            self.pause_reading()
+
     def on_body(self, body: bytes):
-        self.body += body
-        if len(self.body) > HIGH_WATER_LIMIT:
-            self.transport.pause_reading()
-        self.message_event.set()
+        self.request_stream.feed_data(body)
 
     def on_message_complete(self):
-        self.more_body = False
-        self.message_event.set()
-        self.cancel_timeout_keep_alive_task()
-        self.environ.update(body=self.body.decode())
-        self.process_request()
-
-    def log_response(self, response):
-        if self.access_log:
-            self.logger.info('[access] %s - - [%s] "%s %s" %s -',
-                             self.environ['ip'],
-                             datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                             self.environ['method'],
-                             self.environ['path'],
-                             response.status)
-
-    def process_request(self):
+        self.cancel_request_timeout()
+        self.request_stream.feed_eof()
+
+    def log_response(self, environ, response):
+        if self.access_log and self.access_logger is not None:
+            self.access_logger.log(environ.ip, environ.method, environ.path, response.status,
+                                   self.loop.time() - self.response_started)
+
+    def process_request(self, environ):
         # Standard case - start processing the request.
         # Handle 503 responses when 'limit_concurrency' is exceeded.
-        self._response_timeout_handler = self.loop.call_later(
-            self.config.response_timeout, self.response_timeout_callback
-        )
-        if self.limit_concurrency is not None and (
-                len(self.connections) >= self.limit_concurrency
+        self.current_environ = environ
+        self.response_started = self.loop.time()
+        self.response_deadline = self.response_started + self.config.response_timeout
+        self.timer_wheel.schedule(self, self.response_deadline, self.loop)
+        if self.server_state.admission is not None:
+            app = self.run_admitted
+        elif self.limit_concurrency is not None and (
+                # self.connections includes this connection.
+                len(self.connections) > self.limit_concurrency
                 or len(self.tasks) >= self.limit_concurrency
         ):
             app = ServiceUnavailable()
+            self.server_state.rejected_requests += 1
             message = "Exceeded concurrency limit."
             self.logger.warning(message)
         else:
             app = self.app
-        task = self.loop.create_task(app(self.environ, self.on_response))
-        task.add_done_callback(self.tasks.discard)
+        task = self.loop.create_task(app(environ, self.on_response))
+        task.add_done_callback(functools.partial(self.on_task_done, environ))
         self.tasks.add(task)
 
+    async def run_admitted(self, environ, on_response):
+        admission = self.server_state.admission
+        if not await admission.acquire(None, admission.get_priority(environ.headers)):
+            self.logger.warning("Request rejected by the admission control.")
+            app = ServiceUnavailable(headers={
+                "Retry-After": str(admission.get_retry_after()),
+                "Content-Length": "0",
+            })
+            return await app(environ, on_response)
+        environ.admitted_at = self.loop.time()
+        failed = True
+        try:
+            await self.app(environ, on_response)
+            failed = False
+        finally:
+            if environ.admitted_at is not None:
+                admission.release(None, self.loop.time() - environ.admitted_at, failed)
+
+    async def acquire_endpoint(self, environ, endpoint):
+        """
+        Take a slot of ``endpoint`` for a request admitted by
+        :meth:`run_admitted`.  The global slot is given back while the
+        request waits, so a saturated endpoint does not hold the slots of
+        the other endpoints, and taken again once the endpoint slot is.
+        """
+        admission = self.server_state.admission
+        if admission.try_acquire(endpoint):
+            return True
+        priority = admission.get_priority(environ.headers)
+        if environ.admitted_at is not None:
+            environ.admitted_at = None
+            admission.release(None)
+        if not await admission.acquire(endpoint, priority):
+            return False
+        try:
+            admitted = await admission.acquire(None, priority)
+        except asyncio.CancelledError:
+            admission.release(endpoint)
+            raise
+        if not admitted:
+            admission.release(endpoint)
+            return False
+        environ.admitted_at = self.loop.time()
+        return True
+
+    def on_task_done(self, environ, task):
+        self.tasks.discard(task)
+        if self.current_environ is environ and self.websocket is None:
+            # The application finished without sending a response.
+            self.close()
+
     async def on_response(self, response):
-        # Callback for pipelined HTTP requests to be started.
+        environ = self.current_environ
+        # A request body that was not read completely can not be skipped,
+        # so the connection is closed after the response.
+        keep_alive = environ.keep_alive and environ.stream.complete \
+            and not self.closing
+        if self.limit_max_requests is not None and \
+                self.server_state.total_requests >= self.limit_max_requests:
+            keep_alive = False
         self.server_state.total_requests += 1
-        if isinstance(response, str):
-            output_content = response
-        else:
-            response.set_protocol(self)
-            output_content = await response.output(
-                self.environ["http_version"],
-                self.environ["keep_alive"],
-                self.environ["keep_alive_timeout"]
-            )
-        self.transport.write(output_content)
-        self.log_response(response)
-        self.cancel_timeout_keep_alive_task()
-        if not self.transport.is_closing():
-            self.transport.close()
-            self.transport = None
+        if self.requests_count:
+            self.server_state.keep_alive_requests += 1
+        self.requests_count += 1
+        response.set_protocol(self)
+        # A HEAD response has the headers of the GET response but no body,
+        # the next request on the connection is read right after them.
+        output = response.head if environ.method == "HEAD" else response.output
+        output_content = await output(
+            environ.http_version,
+            keep_alive,
+            self.keep_alive_timeout
+        )
+        if self.transport is None:
+            return
+        if output_content:
+            self.server_state.bytes_sent += len(output_content)
+            self.transport.write(output_content)
+        self.log_response(environ, response)
+        self.on_response_complete(keep_alive)
+
+    def on_response_complete(self, keep_alive):
+        self.current_environ = None
+        self.cancel_response_timeout()
+        if self.transport is not None:
+            self.update_write_buffered(self.transport.get_write_buffer_size())
+        if not keep_alive or self.transport.is_closing():
+            self.close()
+        elif self.pipeline:
+            self.process_request(self.pipeline.popleft())
+            if len(self.pipeline) < MAX_PIPELINED_REQUESTS:
+                self.resume_reading()
         else:
             # Set a short Keep-Alive timeout.
-            self.timeout_keep_alive_task = self.loop.call_later(
-                self.timeout_keep_alive, self.timeout_keep_alive_handler
-            )
+            self.last_activity = self.loop.time()
+            self.timer_wheel.schedule(
+                self, self.last_activity + self.timeout_keep_alive, self.loop)
 
     def shutdown(self):
         """
         Called by the server to commence a graceful shutdown.
         """
-        if not self.transport.is_closing():
-            self.transport.close()
+        self.closing = True
+        if self.current_environ is None:
+            self.close()
+
+    def pause_reading(self):
+        if not self.reading_paused and self.transport is not None:
+            self.reading_paused = True
+            self.transport.pause_reading()
+
+    def resume_reading(self):
+        if self.reading_paused and self.transport is not None:
+            self.reading_paused = False
+            self.transport.resume_reading()
 
     def pause_writing(self):
         """
         Called by the transport when the write buffer exceeds the high water mark.
         """
-        self.message_event.clear()
+        self.writing_paused = True
 
     def resume_writing(self):
         """
         Called by the transport when the write buffer drops below the low water mark.
         """
-        self.message_event.set()
+        self.writing_paused = False
+        if self.transport is not None:
+            self.update_write_buffered(self.transport.get_write_buffer_size())
+            if self.write_throttled:
+                self.unthrottle_writing()
+        self._wakeup_writer()
+
+    def _wakeup_writer(self):
+        waiter = self._drain_waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def update_write_buffered(self, size):
+        """
+        Record the write buffer size of the connection in the worker total,
+        the total is refreshed when the connection writes or drains.
+        """
+        self.server_state.buffered_bytes += size - self.write_buffered
+        self.write_buffered = size
+
+    def throttle_writing(self):
+        """
+        Lower the high water mark to the low one while the worker buffers
+        more than ``max_buffered_bytes``, which pauses the connection until
+        its buffer is drained below the low water mark.
+        """
+        self.write_throttled = True
+        self.server_state.throttled_writes += 1
+        self.reset_write_buffer_limits()
+
+    def unthrottle_writing(self):
+        self.write_throttled = False
+        self.reset_write_buffer_limits()
+
+    def reset_write_buffer_limits(self):
+        low_water = self.config.write_buffer_low_water
+        high_water = low_water if self.write_throttled else self.config.write_buffer_high_water
+        self.transport.set_write_buffer_limits(high=high_water, low=low_water)
 
     async def drain(self):
-        await self.message_event.wait()
+        """
+        Wait until the written data may be buffered, per connection and
+        against the worker wide ``max_buffered_bytes``.
+        """
+        transport = self.transport
+        if transport is None:
+            return
+        self.update_write_buffered(transport.get_write_buffer_size())
+        if not self.writing_paused:
+            max_buffered_bytes = self.config.max_buffered_bytes
+            if max_buffered_bytes is None or \
+                    self.server_state.buffered_bytes <= max_buffered_bytes:
+                if self.write_throttled:
+                    self.unthrottle_writing()
+                return
+            if not self.write_throttled:
+                self.throttle_writing()
+            if not self.writing_paused:
+                return
+        await self._wait_writer()
 
     def timeout_keep_alive_handler(self):
         """
         Called on a keep-alive connection if no new data is received after a short delay.
         """
-        self.shutdown()
+        self.close()
 
     def push_data(self, data):
+        self.server_state.bytes_sent += len(data)
         self.transport.write(data)
 
+    async def sendfile(self, file, offset=0, count=None):
+        """
+        Write ``count`` bytes of ``file`` starting at ``offset`` to the
+        transport without reading the file into memory when possible.
+        The response deadline is moved forward each time data is sent, a
+        long download is only cut off when the client stops reading.
+        """
+        if count is None:
+            count = os.fstat(file.fileno()).st_size - offset
+        if count <= 0:
+            return 0
+        try:
+            # loop.sendfile does not report its progress.
+            self.cancel_response_timeout()
+            sent = await self.loop.sendfile(self.transport, file, offset, count)
+            self.server_state.bytes_sent += sent
+            return sent
+        except NotImplementedError:
+            # uvloop does not implement loop.sendfile.
+            pass
+        except RuntimeError:
+            # asyncio refuses transports that do not wrap a socket.
+            if self.transport is None or self.transport.is_closing():
+                raise
+        self.extend_response_timeout()
+        sock = self.transport.get_extra_info("socket")
+        if sock is None or is_ssl(self.transport) or not hasattr(os, "sendfile"):
+            return await self.sendfile_fallback(file, offset, count)
+        # Everything written before must leave the transport buffer first.
+        await self.flush()
+        if self.closed_for_writing():
+            return 0
+        # A duplicate descriptor can be watched by the loop while the
+        # transport owns the socket.
+        fd = os.dup(sock.fileno())
+        try:
+            sent = await self._sendfile_nonblocking(fd, file.fileno(), offset, count)
+            self.server_state.bytes_sent += sent
+            return sent
+        finally:
+            os.close(fd)
+
+    def closed_for_writing(self):
+        return self.transport is None or self.transport.is_closing()
+
+    async def flush(self):
+        """
+        Wait until the transport write buffer is empty.
+        """
+        transport = self.transport
+        if transport is None or not transport.get_write_buffer_size():
+            return
+        # The transport pauses the protocol at once and resumes it when the
+        # buffer is empty.
+        transport.set_write_buffer_limits(high=0, low=0)
+        try:
+            if self.writing_paused:
+                await self._wait_writer()
+        finally:
+            if not self.closed_for_writing():
+                self.reset_write_buffer_limits()
+
+    async def _wait_writer(self):
+        # Woken by resume_writing, connection_lost or the loop writer.
+        self._drain_waiter = self.loop.create_future()
+        try:
+            await self._drain_waiter
+        finally:
+            self._drain_waiter = None
+
+    async def _sendfile_nonblocking(self, fd, file_fd, offset, count):
+        total = 0
+        while count > 0 and not self.closed_for_writing():
+            try:
+                sent = os.sendfile(fd, file_fd, offset, count)
+            except BlockingIOError:
+                self.loop.add_writer(fd, self._wakeup_writer)
+                try:
+                    await self._wait_writer()
+                finally:
+                    self.loop.remove_writer(fd)
+                continue
+            except (BrokenPipeError, ConnectionResetError):
+                break
+            if sent == 0:
+                break
+            self.extend_response_timeout()
+            offset += sent
+            count -= sent
+            total += sent
+        return total
+
+    async def sendfile_fallback(self, file, offset, count):
+        """
+        Chunked copy used for TLS transports, constant in memory.
+        """
+        def read_chunk(position, size):
+            file.seek(position)
+            return file.read(size)
+
+        total = 0
+        while count > 0 and self.transport is not None:
+            data = await self.loop.run_in_executor(
+                None, read_chunk, offset, min(SENDFILE_CHUNK_SIZE, count))
+            if not data:
+                break
+            self.push_data(data)
+            self.extend_response_timeout()
+            offset += len(data)
+            count -= len(data)
+            total += len(data)
+            await self.drain()
+        return total
+
     def close(self):
         """
         Force close the connection.
@@ -376,6 +903,11 @@ class WebSocketProtocol(HttpProtocol):
         if self.websocket is None:
             super().timeout_keep_alive_handler()
 
+    def get_timeout(self):
+        if self.websocket is not None:
+            return None
+        return super().get_timeout()
+
     def connection_lost(self, exc):
         if self.websocket is not None:
             self.websocket.connection_lost(exc)
@@ -407,7 +939,7 @@ class WebSocketProtocol(HttpProtocol):
             if self.debug:
                 msg += "\n" + traceback.format_exc()
             self.logger.error(msg)
-            self.on_response(msg)
+            self.send_bad_request(msg)
             raise RuntimeError(msg)
 
         subprotocol = None
@@ -449,11 +981,59 @@ class ServerState:
     Shared servers state that is available between all protocol instances.
     """
 
-    def __init__(self, total_requests=0, connections=None, tasks=None, default_headers=None):
+    def __init__(self, total_requests=0, connections=None, tasks=None, default_headers=None,
+                 timer_resolution=1.0):
         self.total_requests = total_requests
+        # Connection reuse counters: accepted connections, requests answered
+        # on an already used connection and requests that were pipelined.
+        self.total_connections = 0
+        self.keep_alive_requests = 0
+        self.pipelined_requests = 0
+        # Bytes waiting in the transport write buffers of all connections
+        # and the number of times a writer was throttled by the worker cap.
+        self.buffered_bytes = 0
+        self.throttled_writes = 0
+        # Traffic counters and requests answered with 503 because of
+        # limit_concurrency.
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.rejected_requests = 0
         self.connections = connections or set()
         self.tasks = tasks or set()
         self.default_headers = default_headers or []
+        self._encoded_headers = {}
+        # Request, response and keep-alive timeouts of all the connections.
+        self.timer_wheel = TimerWheel(timer_resolution)
+        # AccessLog and AdmissionController shared by the connections, set
+        # by the server.
+        self.access_log = None
+        self.admission = None
+
+    def encode_default_headers(self, extra_headers=()):
+        """
+        Encode ``default_headers`` plus the server config ones once and
+        return ``(block, lines, names)``: the joined header block, the
+        ``(lowercase name, line)`` pairs and the set of lowercase names.
+        """
+        key = tuple(extra_headers)
+        try:
+            return self._encoded_headers[key]
+        except KeyError:
+            pass
+        lines = []
+        for name, value in list(self.default_headers) + list(key):
+            if isinstance(name, bytes):
+                name = name.decode("latin-1")
+            if not isinstance(value, bytes):
+                value = str(value).encode("latin-1")
+            lines.append((name.lower(), b"%b: %b\r\n" % (name.encode("latin-1"), value)))
+        encoded = (
+            b"".join(line for _, line in lines),
+            lines,
+            frozenset(name for name, _ in lines),
+        )
+        self._encoded_headers[key] = encoded
+        return encoded
 
 
 class Server(object):
@@ -465,8 +1045,32 @@ class Server(object):
         self.logger = config.logger
         self.socket = config.socket
         self.servers = []
-        self.server_state = server_state or ServerState()
+        self.server_state = server_state or ServerState(
+            timer_resolution=config.timer_resolution)
         self.app.loop = self.loop
+        self.app.server_state = self.server_state
+        if self.server_state.access_log is None and config.access_log:
+            self.server_state.access_log = AccessLog(
+                path=config.access_log_path,
+                format=config.access_log_format,
+                buffer_size=config.access_log_buffer,
+                flush_interval=config.access_log_flush_interval,
+                sample_rate=config.access_log_sample_rate,
+            )
+        if self.server_state.admission is None and config.admission_control \
+                and not getattr(app, "is_websocket", False):
+            self.server_state.admission = AdmissionController(
+                self.server_state,
+                self.loop,
+                limit=config.limit_concurrency,
+                endpoint_limits=config.endpoint_limits,
+                adaptive=config.adaptive_concurrency,
+                min_limit=config.min_concurrency,
+                queue_size=config.admission_queue_size,
+                queue_timeout=config.admission_queue_timeout,
+                priority_header=config.priority_header,
+                retry_after=config.retry_after,
+            )
 
         if self.config.debug:
             self.loop.set_debug(True)
@@ -516,8 +1120,12 @@ class Server(object):
             self.started = True
             self.servers = [server]
             self.logger.info("Starting worker [%s]", pid)
+            if self.socket is not None:
+                host, port = self.socket.getsockname()[:2]
+            else:
+                host, port = self.config.host, self.config.port
             message = "Server running on http://%s:%d (Press CTRL+C to quit)"
-            self.logger.info(message % (self.config.host, self.config.port))
+            self.logger.info(message % (host, port))
             self.loop.run_forever()
         finally:
             self.logger.info("Stopping worker [%s]", pid)
@@ -539,6 +1147,8 @@ class Server(object):
                 self.loop.run_until_complete(asyncio.sleep(0.1))
                 start_shutdown = start_shutdown + 0.1
 
+            self.server_state.timer_wheel.stop()
+
             # Force close non-idle connection after waiting for
             # graceful_shutdown_timeout
             coros = []
@@ -550,7 +1160,10 @@ class Server(object):
 
             _shutdown = asyncio.gather(*coros, loop=self.loop)
             self.loop.run_until_complete(_shutdown)
+            self.loop.run_until_complete(self.app.shutdown())
             self.loop.close()
+            if self.server_state.access_log is not None:
+                self.server_state.access_log.close()
 
 
 __all__ = [
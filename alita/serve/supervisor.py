@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import multiprocessing
+from alita.serve.config import ServerConfig, get_logger
+from alita.serve.server import Server, ServerState
+
+REPORT_INTERVAL = 1.0
+# Delay before restarting a worker that died, doubled for each crash of a
+# worker that ran less than STABLE_UPTIME seconds, up to MAX_RESTART_DELAY.
+RESTART_DELAY = 0.5
+MAX_RESTART_DELAY = 30.0
+STABLE_UPTIME = 10.0
+# Only Linux spreads the connections over the SO_REUSEPORT listeners.
+REUSE_PORT = hasattr(socket, "SO_REUSEPORT") and sys.platform.startswith("linux")
+
+
+def create_socket(host="127.0.0.1", port=8000, backlog=100, reuse_port=True, listen=True):
+    """
+    Bind a socket on ``host:port``, listening unless ``listen`` is false.
+    """
+    family = socket.AF_INET6 if host and ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port and hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    if listen:
+        sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, index, counters, config_kwargs, address=None):
+    """
+    Entry point of a worker process, serves ``app`` on its own SO_REUSEPORT
+    socket bound to ``address`` or on the inherited ``sock``, and reports
+    its request count into the shared ``counters`` array.
+    """
+    if address is not None:
+        sock = create_socket(*address)
+    config = ServerConfig(host=None, port=None, socket=sock, **config_kwargs)
+    server_state = ServerState(timer_resolution=config.timer_resolution)
+
+    def report():
+        counters[index] = server_state.total_requests
+        config.loop.call_later(REPORT_INTERVAL, report)
+
+    config.loop.call_soon(report)
+    try:
+        Server(app, config, server_state).run()
+    finally:
+        counters[index] = server_state.total_requests
+
+
+class Supervisor(object):
+    """
+    Pre-fork ``workers`` processes serving one app and restart the ones
+    that die.  On Linux every worker listens on its own SO_REUSEPORT socket
+    so that the kernel spreads the connections over the workers, the
+    supervisor only keeps the port bound.  Elsewhere the workers share the
+    listening socket of the supervisor.
+    """
+    def __init__(self, app, workers, host="127.0.0.1", port=8000,
+                 backlog=100, check_interval=1.0, logger=None, **config_kwargs):
+        self.app = app
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.check_interval = check_interval
+        # Same logging setup as the workers, else the INFO lines of the
+        # supervisor are dropped.
+        get_logger(config_kwargs.get("log_level", logging.INFO))
+        self.logger = logger or app.logger
+        self.config_kwargs = config_kwargs
+        self.context = multiprocessing.get_context("fork")
+        self.counters = self.context.Array("Q", workers, lock=False)
+        self.processes = [None] * workers
+        self.started_at = [0.0] * workers
+        self.crashes = [0] * workers
+        self.restart_at = [None] * workers
+        self.reuse_port = config_kwargs.pop("reuse_port", True) and REUSE_PORT
+        self.finished_requests = 0
+        self.socket = None
+        self.should_exit = False
+
+    @property
+    def total_requests(self):
+        """
+        Requests handled by all workers, including the restarted ones.
+        """
+        return self.finished_requests + sum(self.counters)
+
+    def spawn(self, index):
+        if self.reuse_port:
+            args = (self.app, None, index, self.counters, self.config_kwargs,
+                    (self.host, self.port, self.backlog))
+        else:
+            args = (self.app, self.socket, index, self.counters, self.config_kwargs)
+        process = self.context.Process(
+            target=run_worker,
+            args=args,
+            name="alita-worker-%d" % index
+        )
+        process.daemon = True
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+        self.restart_at[index] = None
+        self.logger.info("Started worker [%s]", process.pid)
+        return process
+
+    def handle_exit(self, sig, frame):
+        self.should_exit = True
+
+    def install_signal_handlers(self):
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self.handle_exit)
+
+    def check_workers(self):
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                if now - self.started_at[index] >= STABLE_UPTIME:
+                    self.crashes[index] = 0
+                continue
+            if self.restart_at[index] is None:
+                if now - self.started_at[index] < STABLE_UPTIME:
+                    self.crashes[index] += 1
+                else:
+                    self.crashes[index] = 0
+                delay = min(MAX_RESTART_DELAY,
+                            RESTART_DELAY * 2 ** max(0, self.crashes[index] - 1))
+                self.restart_at[index] = now + delay
+                self.logger.warning("Worker [%s] died with exit code %s, restarting in %.1fs",
+                                    process.pid, process.exitcode, delay)
+                self.finished_requests += self.counters[index]
+                self.counters[index] = 0
+            if now >= self.restart_at[index]:
+                self.spawn(index)
+
+    def stop_workers(self):
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                process.join(self.config_kwargs.get("graceful_shutdown_timeout", 10.0))
+                if process.is_alive():
+                    process.kill()
+
+    def run(self):
+        self.socket = create_socket(self.host, self.port, self.backlog,
+                                    listen=not self.reuse_port)
+        self.port = self.socket.getsockname()[1]
+        metrics = getattr(self.app, "metrics", None)
+        if metrics is not None:
+            metrics.clear_snapshots()
+        self.install_signal_handlers()
+        message = "Supervisor [%s] running on http://%s:%d with %d workers"
+        self.logger.info(message, os.getpid(), self.host, self.port, self.workers)
+        try:
+            for index in range(self.workers):
+                self.spawn(index)
+            while not self.should_exit:
+                time.sleep(self.check_interval)
+                if not self.should_exit:
+                    self.check_workers()
+        finally:
+            self.stop_workers()
+            self.socket.close()
+            self.logger.info("Stopping supervisor [%s], handled %d requests",
+                             os.getpid(), self.total_requests)
+
+
+__all__ = [
+    "Supervisor",
+    "create_socket",
+]
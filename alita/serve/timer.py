@@ -0,0 +1,100 @@
+class TimerWheel:
+    """
+    Hashed timer wheel of ``size`` slots of ``resolution`` seconds shared
+    by all the connections of a server, driven by one periodic tick.
+
+    Entries provide ``get_timeout()`` returning ``(deadline, callback)``
+    or ``None`` once they need no timeout.  Connections only record their
+    activity: an entry whose deadline moved later is put back in the
+    right slot when its old slot expires, ``schedule`` has to be called
+    again only when the deadline moves earlier.
+    """
+    def __init__(self, resolution=1.0, size=64):
+        self.resolution = resolution
+        self.size = size
+        self.slots = [set() for _ in range(size)]
+        self.entries = {}
+        self.current_tick = None
+        self.loop = None
+        self._handle = None
+        self.expired = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_tick(self, deadline):
+        # Rounded up so that entries never expire early.
+        return -int(-deadline // self.resolution)
+
+    def schedule(self, entry, deadline, loop):
+        tick = self.get_tick(deadline)
+        if self.current_tick is not None and tick <= self.current_tick:
+            tick = self.current_tick + 1
+        current = self.entries.get(entry)
+        if current is not None:
+            if current <= tick:
+                return
+            self.slots[current % self.size].discard(entry)
+        self.entries[entry] = tick
+        self.slots[tick % self.size].add(entry)
+        if self._handle is None:
+            self.start(loop)
+
+    def remove(self, entry):
+        tick = self.entries.pop(entry, None)
+        if tick is not None:
+            self.slots[tick % self.size].discard(entry)
+
+    def start(self, loop):
+        self.loop = loop
+        if self.current_tick is None:
+            self.current_tick = int(loop.time() // self.resolution)
+        self._handle = loop.call_later(self.resolution, self.tick)
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def tick(self):
+        """
+        Expire the entries of every slot passed since the previous tick.
+        """
+        now = self.loop.time()
+        now_tick = int(now // self.resolution)
+        # A late tick still visits each slot only once.
+        first = max(self.current_tick + 1, now_tick - self.size + 1)
+        for tick in range(first, now_tick + 1):
+            slot = self.slots[tick % self.size]
+            if not slot:
+                continue
+            for entry in list(slot):
+                if self.entries[entry] > now_tick:
+                    continue
+                slot.discard(entry)
+                del self.entries[entry]
+                self.expire(entry, now)
+        self.current_tick = now_tick
+        if self.entries:
+            self._handle = self.loop.call_later(self.resolution, self.tick)
+        else:
+            self._handle = None
+
+    def expire(self, entry, now):
+        timeout = entry.get_timeout()
+        if timeout is None:
+            return
+        deadline, callback = timeout
+        if deadline > now:
+            self.schedule(entry, deadline, self.loop)
+            return
+        self.expired += 1
+        callback()
+        timeout = entry.get_timeout()
+        if timeout is not None:
+            self.schedule(entry, timeout[0], self.loop)
+
+
+__all__ = [
+    "TimerWheel",
+]
@@ -0,0 +1,385 @@
+import os
+import time
+import uuid
+import json
+import sqlite3
+import asyncio
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itsdangerous import Signer, BadSignature
+from alita.base import BaseSessionEngine
+from alita.datastructures import CallbackDict
+from alita.helpers import cached_property, import_string
+
+SESSION_ENGINES = {
+    "memory": "alita.sessions.MemorySessionEngine",
+    "file": "alita.sessions.FileSessionEngine",
+    "sqlite": "alita.sessions.SQLiteSessionEngine",
+}
+
+
+class Session(CallbackDict):
+    """
+    Session data of one request.  ``modified`` is set by every change of
+    the dict itself, set it by hand after changing a nested value.
+    ``expires`` is the expiry of the stored session.
+    """
+    def __init__(self, initial=None, session_id=None, new=False, expires=None):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.session_id = session_id
+        self.new = new
+        self.expires = expires
+        self.modified = False
+
+
+class LazySession:
+    """
+    Awaitable returned by ``request.session``, the session is loaded from
+    the engine on the first ``await`` and the same object is returned by
+    the next ones.
+    """
+    __slots__ = ("request", "session")
+
+    def __init__(self, request):
+        self.request = request
+        self.session = None
+
+    async def load(self):
+        if self.session is None:
+            self.session = await self.request.app.session_interface.open_session(self.request)
+        return self.session
+
+    def __await__(self):
+        return self.load().__await__()
+
+
+class MemorySessionEngine(BaseSessionEngine):
+    """
+    In-process LRU of ``max_entries`` sessions (``SESSION_ENGINE_CONFIG``),
+    only usable with a single worker process.
+    """
+    def __init__(self, app):
+        super().__init__(app)
+        self.max_entries = self.options.get("max_entries", 10000)
+        self.entries = OrderedDict()
+
+    async def load(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        data, expires = entry
+        if expires is not None and time.time() >= expires:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return data, expires
+
+    async def save(self, key, data, expires):
+        self.entries[key] = (data, expires)
+        self.entries.move_to_end(key)
+        while self.max_entries and len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def delete(self, key):
+        self.entries.pop(key, None)
+
+    async def sweep(self):
+        now = time.time()
+        expired = [key for key, (_, expires) in self.entries.items()
+                   if expires is not None and now >= expires]
+        for key in expired:
+            del self.entries[key]
+        return len(expired)
+
+
+class FileSessionEngine(BaseSessionEngine):
+    """
+    One file per session in ``directory`` (``SESSION_ENGINE_CONFIG``),
+    written to a temporary file and renamed without fsync.  File access
+    runs in the default executor.
+    """
+    suffix = ".session"
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.directory = self.options.get("directory") or \
+            os.path.join(tempfile.gettempdir(), "alita-sessions")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_path(self, key):
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + self.suffix)
+
+    def _load(self, path):
+        try:
+            with open(path, "rb") as f:
+                expires = json.loads(f.readline())
+                if expires is not None and time.time() >= expires:
+                    data = None
+                else:
+                    data = f.read()
+        except (OSError, ValueError):
+            return None
+        if data is None:
+            self._unlink(path)
+            return None
+        return data, expires
+
+    def _save(self, path, data, expires):
+        temp_path = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+        with open(temp_path, "wb") as f:
+            f.write(b"".join((json.dumps(expires).encode(), b"\n", data)))
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _sweep(self):
+        now = time.time()
+        count = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path, "rb") as f:
+                    expires = json.loads(f.readline())
+            except (OSError, ValueError):
+                continue
+            if expires is not None and now >= expires:
+                self._unlink(path)
+                count += 1
+        return count
+
+    async def run(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    async def load(self, key):
+        return await self.run(self._load, self.get_path(key))
+
+    async def save(self, key, data, expires):
+        await self.run(self._save, self.get_path(key), data, expires)
+
+    async def delete(self, key):
+        await self.run(self._unlink, self.get_path(key))
+
+    async def sweep(self):
+        return await self.run(self._sweep)
+
+
+class SQLiteSessionEngine(BaseSessionEngine):
+    """
+    Sessions stored in the ``SESSION_TABLE_NAME`` table of the ``database``
+    file (``SESSION_ENGINE_CONFIG``).  One connection in WAL mode with
+    ``synchronous=NORMAL`` is used from a single worker thread, so
+    commits do not wait for an fsync.
+    """
+    def __init__(self, app):
+        super().__init__(app)
+        self.database = self.options.get("database") or \
+            os.path.join(tempfile.gettempdir(), "alita-sessions.db")
+        self.table = app.config.get("SESSION_TABLE_NAME") or "session"
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            connection = sqlite3.connect(self.database, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS "%s" ('
+                'session_key TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL)' % self.table)
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS "%s_expires" ON "%s" (expires)' % (
+                    self.table, self.table))
+            connection.commit()
+            self.connection = connection
+        return self.connection
+
+    def _load(self, key):
+        row = self.connect().execute(
+            'SELECT data, expires FROM "%s" WHERE session_key = ?' % self.table,
+            (key,)).fetchone()
+        if row is None:
+            return None
+        data, expires = row
+        if expires is not None and time.time() >= expires:
+            return None
+        return bytes(data), expires
+
+    def _execute(self, sql, params):
+        connection = self.connect()
+        cursor = connection.execute(sql % self.table, params)
+        connection.commit()
+        return cursor.rowcount
+
+    async def run(self, func, *args):
+        return await asyncio.get_event_loop().run_in_executor(self.executor, func, *args)
+
+    async def load(self, key):
+        return await self.run(self._load, key)
+
+    async def save(self, key, data, expires):
+        await self.run(
+            self._execute,
+            'INSERT OR REPLACE INTO "%s" (session_key, data, expires) VALUES (?, ?, ?)',
+            (key, data, expires))
+
+    async def delete(self, key):
+        await self.run(self._execute, 'DELETE FROM "%s" WHERE session_key = ?', (key,))
+
+    async def sweep(self):
+        return await self.run(
+            self._execute, 'DELETE FROM "%s" WHERE expires < ?', (time.time(),))
+
+
+class SessionInterface:
+    """
+    Loads the session named by the session cookie and writes it back
+    after the response middlewares, only when it was modified or with
+    ``SESSION_SAVE_EVERY_REQUEST``.  With ``SESSION_REFRESH_EACH_REQUEST``
+    an unmodified session is saved again, with a new expiry and cookie,
+    once half of its ``SESSION_COOKIE_EXPIRE`` has passed.  Expired
+    sessions are removed in one batch every ``sweep_interval`` seconds
+    (``SESSION_ENGINE_CONFIG``).
+    """
+    salt = "alita-session"
+
+    def __init__(self, app):
+        self.app = app
+        self.last_sweep = time.monotonic()
+        self._sweep_task = None
+
+    @cached_property
+    def engine(self):
+        engine = self.app.config.get("SESSION_ENGINE") or "memory"
+        engine_class = import_string(SESSION_ENGINES.get(engine, engine))
+        return engine_class(self.app)
+
+    @cached_property
+    def signer(self):
+        secret_key = self.app.config.get("SECRET_KEY")
+        if not secret_key:
+            raise RuntimeError("SESSION_USE_SIGNER requires SECRET_KEY to be set.")
+        return Signer(secret_key, salt=self.salt, key_derivation="hmac")
+
+    def get_session_id(self, request):
+        value = request.cookies.get(self.app.config.get("SESSION_COOKIE_NAME"))
+        if not value:
+            return None
+        if self.app.config.get("SESSION_USE_SIGNER"):
+            try:
+                value = self.signer.unsign(value).decode()
+            except BadSignature:
+                return None
+        return value
+
+    def get_cookie_value(self, session_id):
+        if self.app.config.get("SESSION_USE_SIGNER"):
+            return self.signer.sign(session_id).decode()
+        return session_id
+
+    def get_key(self, session_id):
+        return (self.app.config.get("SESSION_KEY_PREFIX") or "") + session_id
+
+    def get_expires(self):
+        max_age = self.app.config.get("SESSION_COOKIE_EXPIRE")
+        return time.time() + max_age if max_age else None
+
+    async def open_session(self, request):
+        self.maybe_sweep()
+        session_id = self.get_session_id(request)
+        if session_id:
+            entry = await self.engine.load(self.get_key(session_id))
+            if entry is not None:
+                data, expires = entry
+                try:
+                    return Session(self.app.json.loads(data), session_id, expires=expires)
+                except ValueError:
+                    pass
+        return Session(session_id=uuid.uuid4().hex, new=True)
+
+    async def save_session(self, request, response, session):
+        config = self.app.config
+        cookie_name = config.get("SESSION_COOKIE_NAME")
+        key = self.get_key(session.session_id)
+        if not session:
+            if not session.new:
+                await self.engine.delete(key)
+                response.delete_cookie(cookie_name, path=config.get("SESSION_COOKIE_PATH") or "/",
+                                       domain=config.get("SESSION_COOKIE_DOMAIN"))
+            return
+        if not session.modified and not config.get("SESSION_SAVE_EVERY_REQUEST") \
+                and not self.should_refresh(session):
+            return
+        await self.engine.save(key, self.app.json.dumps(dict(session)), self.get_expires())
+        max_age = None
+        if not config.get("SESSION_EXPIRE_AT_BROWSER_CLOSE"):
+            max_age = config.get("SESSION_COOKIE_EXPIRE")
+        response.set_cookie(
+            cookie_name,
+            self.get_cookie_value(session.session_id),
+            max_age=max_age,
+            path=config.get("SESSION_COOKIE_PATH") or "/",
+            domain=config.get("SESSION_COOKIE_DOMAIN"),
+            secure=config.get("SESSION_COOKIE_SECURE"),
+            httponly=config.get("SESSION_COOKIE_HTTPONLY"),
+            samesite=config.get("SESSION_COOKIE_SAMESITE"),
+        )
+
+    def should_refresh(self, session):
+        config = self.app.config
+        max_age = config.get("SESSION_COOKIE_EXPIRE")
+        if not max_age or not config.get("SESSION_REFRESH_EACH_REQUEST"):
+            return False
+        return session.expires is None or session.expires - time.time() < max_age / 2
+
+    def maybe_sweep(self):
+        interval = self.engine.options.get("sweep_interval", 60)
+        now = time.monotonic()
+        if interval and now - self.last_sweep >= interval and self._sweep_task is None:
+            self.last_sweep = now
+            self._sweep_task = asyncio.ensure_future(self.sweep())
+            self._sweep_task.add_done_callback(self._sweep_done)
+
+    def _sweep_done(self, task):
+        self._sweep_task = None
+
+    async def sweep(self):
+        try:
+            return await self.engine.sweep()
+        except Exception:
+            self.app.logger.exception("Session sweep failed")
+            return 0
+
+    async def close(self):
+        """
+        Cancel the running sweep, called by :meth:`alita.app.Alita.shutdown`.
+        """
+        task = self._sweep_task
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+__all__ = [
+    "Session",
+    "SessionInterface",
+    "MemorySessionEngine",
+    "FileSessionEngine",
+    "SQLiteSessionEngine",
+]
@@ -89,10 +89,10 @@ class GunicornWorker(Worker):
                     conn.close()
             _shutdown = asyncio.gather(*coros, loop=self.loop)
             await _shutdown
+            await self.app.callable.shutdown()
 
     async def _run(self):
         for socket in self.sockets:
-            state = ServerState(connections=self.connections)
             config = ServerConfig(
                 host=None,
                 port=None,
@@ -101,6 +101,8 @@ class GunicornWorker(Worker):
                 connections=self.connections,
                 **self._server_config
             )
+            state = ServerState(connections=self.connections,
+                                timer_resolution=config.timer_resolution)
             server = await Server(self.app.callable, config, state).run()
             self.servers[server] = state
 
@@ -0,0 +1,6 @@
+"""
+In-process benchmarks for alita.
+
+Run the request pipeline suite with ``python -m benchmarks``; the
+``bench_*`` modules are focused micro-benchmarks.
+"""
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark of the JSON providers on large payloads.
+
+Compares every installed provider against the previous path (``dumps``
+to str, then encoded by the response, and ``loads`` on decoded text) and
+prints the time per document.
+
+    python -m benchmarks.bench_json [-n 20] [-r 5] [--items 10000]
+"""
+import sys
+import json
+import time
+import argparse
+from alita.json_provider import StdJSONProvider, UJSONProvider, OrjsonProvider, \
+    orjson, ujson
+
+
+class App:
+    def __init__(self, **config):
+        self.config = config
+
+
+def create_payload(items):
+    return {
+        "count": items,
+        "items": [
+            {
+                "id": index,
+                "name": "item-%d" % index,
+                "price": index * 1.25,
+                "tags": ["red", "green", "blue"],
+                "active": index % 2 == 0,
+                "owner": {"id": index % 97, "email": "user%d@example.com" % (index % 97)},
+            }
+            for index in range(items)
+        ],
+    }
+
+
+def legacy_dumps(obj):
+    return json.dumps(obj).encode()
+
+
+def legacy_loads(data):
+    return json.loads(data.decode("utf-8"))
+
+
+def timeit(func, arg, number, repeat):
+    func(arg)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / number * 1e3
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--number", type=int, default=20)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--items", type=int, default=10000)
+    args = parser.parse_args(argv)
+    payload = create_payload(args.items)
+    data = legacy_dumps(payload)
+    print("payload %d bytes" % len(data))
+    providers = [("json", StdJSONProvider)]
+    if ujson is not None:
+        providers.append(("ujson", UJSONProvider))
+    if orjson is not None:
+        providers.append(("orjson", OrjsonProvider))
+    dumps_ms = timeit(legacy_dumps, payload, args.number, args.repeat)
+    loads_ms = timeit(legacy_loads, data, args.number, args.repeat)
+    print("%-8s %-10s dumps %8.2f ms   loads %8.2f ms" % ("legacy", "", dumps_ms, loads_ms))
+    for name, provider_class in providers:
+        for label, config in (
+                ("default", {}),
+                ("sorted", {"JSON_SORT_KEYS": True}),
+                ("utf-8", {"JSON_AS_ASCII": False})):
+            provider = provider_class(App(**config))
+            ms = timeit(provider.dumps, payload, args.number, args.repeat)
+            print("%-8s %-10s dumps %8.2f ms   loads %8.2f ms   x%.2f" % (
+                name, label, ms,
+                timeit(provider.loads, data, args.number, args.repeat),
+                dumps_ms / ms))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Micro-benchmark of the per-request parsing cost.
+
+Feeds a typical browser request through ``HttpProtocol`` with an in-memory
+transport, builds the ``Request`` the application sees and reads the
+attributes a view usually touches.  Prints the time per request, the
+memory blocks and bytes kept alive by one request and the peak bytes
+allocated while parsing it.
+
+    python -m benchmarks.bench_request [-n 20000] [-r 5]
+"""
+import sys
+import time
+import asyncio
+import argparse
+import tracemalloc
+from alita import Alita
+from benchmarks.harness import CaptureProtocol, create_protocol
+
+REQUEST = (
+    b"GET /users/42/profile?tab=posts&page=2 HTTP/1.1\r\n"
+    b"Host: example.com\r\n"
+    b"User-Agent: Mozilla/5.0 (X11; Linux x86_64; rv:68.0) Gecko/20100101\r\n"
+    b"Accept: text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8\r\n"
+    b"Accept-Language: en-US,en;q=0.5\r\n"
+    b"Accept-Encoding: gzip, deflate\r\n"
+    b"Cookie: session=4b7a9c1e; theme=dark\r\n"
+    b"Connection: keep-alive\r\n"
+    b"\r\n"
+)
+
+
+def create_app():
+    app = Alita()
+
+    @app.route("/users/<user_id:int>/profile")
+    async def profile(request, user_id):
+        return "profile"
+
+    return app
+
+
+def handle(app, protocol, captured):
+    protocol.data_received(REQUEST)
+    environ = captured.pop()
+    protocol.on_message_begin()
+    request = app.app_factory.create_request_object(environ)
+    request.path, request.method, request.args
+    return request
+
+
+def run(number, repeat=5, samples=200):
+    loop = asyncio.new_event_loop()
+    app = create_app()
+    protocol = create_protocol(CaptureProtocol, app, loop)
+    captured = []
+    protocol.on_environ = captured.append
+    try:
+        for _ in range(1000):
+            handle(app, protocol, captured)
+        elapsed = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                handle(app, protocol, captured)
+            timing = time.perf_counter() - start
+            elapsed = timing if elapsed is None else min(elapsed, timing)
+        blocks = size = peak = 0
+        for _ in range(samples):
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            request = handle(app, protocol, captured)
+            after = tracemalloc.take_snapshot()
+            peak += tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            for stat in after.compare_to(before, "filename"):
+                if "tracemalloc" not in stat.traceback[0].filename:
+                    blocks += stat.count_diff
+                    size += stat.size_diff
+            del request
+    finally:
+        protocol.close()
+        loop.close()
+    return elapsed / number * 1e9, blocks / samples, size / samples, peak / samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--number", type=int, default=20000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+    ns, blocks, size, peak = run(args.number, args.repeat)
+    print("%.0f ns/request  %.0f blocks  %.0f B retained  %.0f B peak" % (
+        ns, blocks, size, peak))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
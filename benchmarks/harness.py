@@ -0,0 +1,202 @@
+"""
+Drives an application in-process, through ``HttpProtocol`` or by calling
+``Alita.__call__`` directly, and measures throughput, latency and memory.
+"""
+import time
+import asyncio
+import tracemalloc
+from alita.serve import ServerConfig
+from alita.serve.server import HttpProtocol, ServerState
+
+
+class MemoryTransport(asyncio.Transport):
+    """
+    Transport keeping the written bytes in memory instead of a socket.
+    """
+    def __init__(self):
+        super().__init__()
+        self.written = 0
+        self.closed = False
+
+    def get_extra_info(self, name, default=None):
+        return {
+            "peername": ("127.0.0.1", 51000),
+            "sockname": ("127.0.0.1", 8000),
+        }.get(name, default)
+
+    def write(self, data):
+        self.written += len(data)
+
+    def is_closing(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+    def pause_reading(self):
+        pass
+
+    def resume_reading(self):
+        pass
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        pass
+
+    def get_write_buffer_size(self):
+        return 0
+
+
+class BenchProtocol(HttpProtocol):
+    """
+    Resolves ``done`` once a response has been completely written.
+    """
+    done = None
+
+    def on_response_complete(self, keep_alive):
+        super().on_response_complete(keep_alive)
+        if self.done is not None and not self.done.done():
+            self.done.set_result(None)
+
+    def close(self):
+        super().close()
+        if self.done is not None and not self.done.done():
+            self.done.set_exception(RuntimeError("connection closed"))
+
+
+class CaptureProtocol(HttpProtocol):
+    """
+    Stops after parsing and hands the environ to ``on_environ``.
+    """
+    on_environ = None
+
+    def process_request(self, environ):
+        self.on_environ(environ)
+
+
+def create_protocol(protocol_class, app, loop, **config_kwargs):
+    config_kwargs.setdefault("access_log", False)
+    config = ServerConfig(host=None, port=None, loop=loop, **config_kwargs)
+    protocol = protocol_class(app, config, ServerState())
+    protocol.connection_made(MemoryTransport())
+    return protocol
+
+
+class Result:
+    """
+    Timings of one scenario, latencies are in seconds.
+    """
+    def __init__(self, name, mode, latencies, elapsed, peak_bytes, live_blocks):
+        self.name = name
+        self.mode = mode
+        self.latencies = sorted(latencies)
+        self.elapsed = elapsed
+        self.peak_bytes = peak_bytes
+        self.live_blocks = live_blocks
+
+    def percentile(self, percent):
+        index = min(len(self.latencies) - 1, int(len(self.latencies) * percent / 100))
+        return self.latencies[index]
+
+    @property
+    def requests_per_second(self):
+        return len(self.latencies) / self.elapsed
+
+    def to_dict(self):
+        return {
+            "scenario": self.name,
+            "mode": self.mode,
+            "requests": len(self.latencies),
+            "rps": round(self.requests_per_second, 1),
+            "p50_us": round(self.percentile(50) * 1e6, 2),
+            "p99_us": round(self.percentile(99) * 1e6, 2),
+            "peak_bytes": round(self.peak_bytes),
+            "live_blocks": round(self.live_blocks, 2),
+        }
+
+
+class Runner:
+    """
+    Sends one raw request ``number`` times to ``app`` and measures it.
+
+    In ``protocol`` mode every request is parsed by ``HttpProtocol`` on a
+    persistent keep-alive connection and the response is serialized to a
+    memory transport.  In ``app`` mode the request is parsed once per
+    iteration outside of the timing and only ``app(environ, on_response)``
+    plus the response output is timed.
+    """
+    def __init__(self, app, loop=None, warmup=200, samples=100):
+        self.app = app
+        self.loop = loop or asyncio.new_event_loop()
+        self.warmup = warmup
+        self.samples = samples
+
+    async def send_protocol(self, protocol, data):
+        protocol.done = self.loop.create_future()
+        protocol.data_received(data)
+        await protocol.done
+
+    def parse(self, capture, data):
+        environs = []
+        capture.on_environ = environs.append
+        capture.data_received(data)
+        capture.on_message_begin()
+        return environs[0]
+
+    async def send_app(self, capture, data):
+        environ = self.parse(capture, data)
+
+        async def on_response(response):
+            response.set_protocol(capture)
+            await response.output(environ.http_version, True, 5)
+
+        start = time.perf_counter()
+        await self.app(environ, on_response)
+        return time.perf_counter() - start
+
+    async def measure(self, mode, data, number):
+        if mode == "protocol":
+            protocol = create_protocol(BenchProtocol, self.app, self.loop)
+
+            async def send():
+                start = time.perf_counter()
+                await self.send_protocol(protocol, data)
+                return time.perf_counter() - start
+        else:
+            protocol = create_protocol(CaptureProtocol, self.app, self.loop)
+
+            async def send():
+                return await self.send_app(protocol, data)
+
+        try:
+            for _ in range(self.warmup):
+                await send()
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(number):
+                latencies.append(await send())
+            elapsed = time.perf_counter() - start
+
+            peak_bytes = live_blocks = 0
+            for _ in range(self.samples):
+                tracemalloc.start()
+                before = tracemalloc.get_traced_memory()[0]
+                blocks = _traced_blocks()
+                await send()
+                peak_bytes += tracemalloc.get_traced_memory()[1] - before
+                live_blocks += _traced_blocks() - blocks
+                tracemalloc.stop()
+        finally:
+            protocol.close()
+        return latencies, elapsed, peak_bytes / self.samples, live_blocks / self.samples
+
+    def run(self, name, mode, data, number):
+        latencies, elapsed, peak_bytes, live_blocks = \
+            self.loop.run_until_complete(self.measure(mode, data, number))
+        return Result(name, mode, latencies, elapsed, peak_bytes, live_blocks)
+
+    def close(self):
+        self.loop.close()
+
+
+def _traced_blocks():
+    return sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
@@ -0,0 +1,123 @@
+"""
+Benchmark application and the requests sent to it.
+"""
+import os
+from alita import Alita, Blueprint
+from alita.templating import render_template
+from alita.exceptions import NotFound
+
+TEMPLATE = """<html>
+<head><title>{{ title }}</title></head>
+<body>
+<ul>
+{% for item in items %}<li class="{{ loop.cycle('odd', 'even') }}">{{ item.name }}: {{ item.value }}</li>
+{% endfor %}</ul>
+</body>
+</html>
+"""
+
+
+class ItemMissing(Exception):
+    pass
+
+
+def create_app(root):
+    """
+    Build the benchmark application, templates and static files are
+    written below ``root``.
+    """
+    template_folder = os.path.join(root, "templates")
+    static_folder = os.path.join(root, "static")
+    os.makedirs(template_folder, exist_ok=True)
+    os.makedirs(static_folder, exist_ok=True)
+    with open(os.path.join(template_folder, "items.html"), "w") as f:
+        f.write(TEMPLATE)
+    with open(os.path.join(static_folder, "app.css"), "w") as f:
+        f.write("body { margin: 0; padding: 0; }\n" * 256)
+
+    app = Alita("benchmarks", static_folder=static_folder,
+                template_folder=template_folder)
+
+    @app.route("/plaintext")
+    async def plaintext(request):
+        return "Hello, World!"
+
+    @app.route("/json")
+    async def json(request):
+        return {"message": "Hello, World!"}
+
+    @app.route("/users/<user_id:int>/posts/<slug>")
+    async def post(request, user_id, slug):
+        return "%d %s" % (user_id, slug)
+
+    @app.route("/items/<name>")
+    async def item(request, name):
+        raise ItemMissing(name)
+
+    @app.error_handler(ItemMissing)
+    async def handle_item_missing(request, exc):
+        return NotFound()
+
+    @app.route("/template")
+    async def template(request):
+        items = [{"name": "item-%d" % i, "value": i} for i in range(20)]
+        return await render_template(request, "items.html", title="Items", items=items)
+
+    @app.route("/items")
+    async def items(request):
+        return [{"id": i, "name": "item-%d" % i, "tags": ["a", "b"]} for i in range(50)]
+
+    @app.route("/cached/items", cache=60)
+    async def cached_items(request):
+        return await items(request)
+
+    bp = Blueprint("admin", url_prefix="/admin")
+
+    @bp.route("/dashboard")
+    async def dashboard(request):
+        return "dashboard"
+
+    def create_middleware(index):
+        async def before(request):
+            return None
+
+        async def after(request, response):
+            response.headers["X-Middleware-%d" % index] = "1"
+            return response
+
+        return before, after
+
+    for index in range(3):
+        before, after = create_middleware(index)
+        app.request_middleware(before)
+        bp.request_middleware(before)
+        bp.response_middleware(after)
+
+    app.register_blueprint(bp)
+    return app
+
+
+def request(path, method="GET", headers=None):
+    lines = [
+        "%s %s HTTP/1.1" % (method, path),
+        "Host: localhost:8000",
+        "User-Agent: alita-benchmarks",
+        "Accept: */*",
+    ]
+    for name, value in (headers or {}).items():
+        lines.append("%s: %s" % (name, value))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+
+SCENARIOS = {
+    "plaintext": request("/plaintext"),
+    "json": request("/json"),
+    "params": request("/users/42/posts/hello-world"),
+    "blueprint": request("/admin/dashboard"),
+    "error": request("/items/unknown"),
+    "not_found": request("/nothing/here"),
+    "template": request("/template"),
+    "items": request("/items"),
+    "cached": request("/cached/items"),
+    "static": request("/static/app.css"),
+}
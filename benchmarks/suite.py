@@ -0,0 +1,126 @@
+"""
+Request pipeline benchmark suite.
+
+    python -m benchmarks [-s plaintext -s json] [-m protocol] [-n 5000]
+                         [-o results.json] [-c baseline.json]
+
+Every scenario is run in-process, without sockets, and reports req/s,
+p50/p99 latency, the peak bytes allocated per request and the memory
+blocks still alive once its response has been written.  Results can be
+stored as JSON and compared with a previous run to spot regressions
+between commits.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+from benchmarks.harness import Runner
+from benchmarks.scenarios import SCENARIOS, create_app
+
+MODES = ("protocol", "app")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scenarios, modes, number, warmup=200, samples=100):
+    logging.disable(logging.CRITICAL)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            app = create_app(root)
+            runner = Runner(app, warmup=warmup, samples=samples)
+            try:
+                for name in scenarios:
+                    for mode in modes:
+                        results.append(runner.run(name, mode, SCENARIOS[name], number))
+            finally:
+                runner.close()
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+def format_row(row, baseline=None):
+    line = "%-10s %-8s %10.0f %9.1f %9.1f %9d %7.1f" % (
+        row["scenario"], row["mode"], row["rps"], row["p50_us"],
+        row["p99_us"], row["peak_bytes"], row["live_blocks"],
+    )
+    if baseline is not None:
+        change = (row["rps"] - baseline["rps"]) / baseline["rps"] * 100
+        line += " %+8.1f%%" % change
+    return line
+
+
+def report(rows, baseline_rows=None, stream=sys.stdout):
+    baseline = {
+        (row["scenario"], row["mode"]): row for row in baseline_rows or ()
+    }
+    header = "%-10s %-8s %10s %9s %9s %9s %7s" % (
+        "scenario", "mode", "req/s", "p50 us", "p99 us", "peak B", "blocks")
+    if baseline_rows is not None:
+        header += " %9s" % "req/s +/-"
+    print(header, file=stream)
+    for row in rows:
+        previous = baseline.get((row["scenario"], row["mode"]))
+        print(format_row(row, previous if baseline_rows is not None and previous else None),
+              file=stream)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description=__doc__.splitlines()[1])
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run, may be repeated (default: all)")
+    parser.add_argument("-m", "--mode", action="append", choices=MODES,
+                        help="drive the HttpProtocol or call the app directly "
+                             "(default: both)")
+    parser.add_argument("-n", "--number", type=int, default=5000,
+                        help="timed requests per scenario")
+    parser.add_argument("-w", "--warmup", type=int, default=200)
+    parser.add_argument("--samples", type=int, default=100,
+                        help="requests traced for the allocation figures")
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    parser.add_argument("-c", "--compare", help="JSON results of a previous run")
+    args = parser.parse_args(argv)
+
+    baseline_rows = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline_rows = json.load(f)["results"]
+
+    results = run_suite(
+        args.scenario or list(SCENARIOS),
+        args.mode or MODES,
+        args.number,
+        args.warmup,
+        args.samples,
+    )
+    rows = [result.to_dict() for result in results]
+    report(rows, baseline_rows)
+
+    if args.output:
+        document = {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "number": args.number,
+            "results": rows,
+        }
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+    return 0
@@ -0,0 +1,96 @@
+import socket
+import asyncio
+import threading
+import pytest
+from alita.serve import Server, ServerConfig
+from alita.serve.server import ServerState
+
+
+class RunningServer:
+    def __init__(self, port, state, loop, server):
+        self.port = port
+        self.state = state
+        self.loop = loop
+        self.server = server
+
+    def connect(self, timeout=5):
+        sock = socket.create_connection(("127.0.0.1", self.port))
+        sock.settimeout(timeout)
+        return sock
+
+
+def read_response(sock, buffer=b"", head=False):
+    """
+    Read one response framed by its Content-Length, return
+    ``(status, headers, body, rest)``.  The response to a HEAD request
+    ends with its headers.
+    """
+    while b"\r\n\r\n" not in buffer:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("connection closed before the headers")
+        buffer += chunk
+    header_block, buffer = buffer.split(b"\r\n\r\n", 1)
+    lines = header_block.decode("latin-1").split("\r\n")
+    assert lines[0].startswith("HTTP/1."), "unexpected data before the status line"
+    status = int(lines[0].split(" ")[1])
+    headers = {}
+    for line in lines[1:]:
+        name, value = line.split(":", 1)
+        headers[name.strip().lower()] = value.strip()
+    length = 0 if head else int(headers["content-length"])
+    while len(buffer) < length:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("connection closed before the body")
+        buffer += chunk
+    return status, headers, buffer[:length], buffer[length:]
+
+
+@pytest.fixture
+def run_server():
+    """
+    Start an app on a free port in a background thread, stopped at the
+    end of the test.  ``loop_factory`` creates the event loop.
+    """
+    running = []
+
+    def start(app, loop_factory=asyncio.new_event_loop, **config):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(100)
+        ready = threading.Event()
+        holder = {}
+
+        def run():
+            loop = loop_factory()
+            asyncio.set_event_loop(loop)
+            config.setdefault("access_log", False)
+            server_config = ServerConfig(
+                host=None, port=None, socket=sock, loop=loop, run_async=True, **config)
+            state = holder["state"] = ServerState(timer_resolution=server_config.timer_resolution)
+            holder["server"] = loop.run_until_complete(Server(app, server_config, state).run())
+            holder["loop"] = loop
+            ready.set()
+            loop.run_forever()
+            holder["server"].close()
+            for connection in list(state.connections):
+                connection.close()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        ready.wait()
+        server = RunningServer(
+            sock.getsockname()[1], holder["state"], holder["loop"], holder["server"])
+        running.append((server, thread))
+        return server
+
+    yield start
+    for server, thread in running:
+        server.loop.call_soon_threadsafe(server.loop.stop)
+        thread.join(5)
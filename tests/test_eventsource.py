@@ -0,0 +1,30 @@
+import time
+from alita import Alita
+from alita.eventsource import EventHub
+
+
+def test_hub_stream_outlives_response_timeout(run_server):
+    app = Alita()
+    hub = EventHub(heartbeat=0.3)
+
+    @app.route("/events")
+    async def events(request):
+        return hub.response(request)
+
+    server = run_server(app, response_timeout=1, timer_resolution=0.1)
+    sock = server.connect()
+    sock.sendall(b"GET /events HTTP/1.1\r\nHost: test\r\n\r\n")
+    started = time.time()
+    data = b""
+    while time.time() - started < 2.5:
+        chunk = sock.recv(65536)
+        assert chunk, "stream cut off by the response timeout"
+        data += chunk
+    assert b": ping" in data
+    server.loop.call_soon_threadsafe(hub.publish, "late")
+    while b"data: late" not in data:
+        chunk = sock.recv(65536)
+        assert chunk
+        data += chunk
+    sock.close()
+    server.loop.call_soon_threadsafe(hub.close)
@@ -0,0 +1,185 @@
+import time
+import socket
+import asyncio
+import pytest
+from alita import Alita
+from alita.response import HTTPResponse, StreamHTTPResponse, FileResponse
+from conftest import read_response
+
+REQUEST = b"GET / HTTP/1.1\r\nHost: test\r\n\r\n"
+
+
+def create_app():
+    app = Alita()
+
+    @app.route("/")
+    async def index(request):
+        return "ok"
+
+    return app
+
+
+def test_limit_concurrency_leaves_out_the_current_connection(run_server):
+    server = run_server(create_app(), limit_concurrency=1)
+    sock = server.connect()
+    sock.sendall(REQUEST)
+    status, _, body, _ = read_response(sock)
+    assert (status, body) == (200, b"ok")
+    sock.close()
+
+
+def test_pipelined_request_answered_after_503(run_server):
+    server = run_server(create_app(), limit_concurrency=1)
+    idle = server.connect()
+    idle.sendall(REQUEST)
+    assert read_response(idle)[0] == 200
+
+    sock = server.connect()
+    sock.sendall(REQUEST * 2)
+    status, headers, body, rest = read_response(sock)
+    assert status == 503
+    assert headers["connection"] == "keep-alive"
+    assert headers["content-length"] == str(len(body))
+    status, _, _, rest = read_response(sock, rest)
+    assert status == 503
+
+    idle.close()
+    deadline = time.time() + 5
+    while len(server.state.connections) > 1 and time.time() < deadline:
+        time.sleep(0.01)
+    sock.sendall(REQUEST)
+    status, _, body, _ = read_response(sock, rest)
+    assert (status, body) == (200, b"ok")
+    sock.close()
+
+
+def test_head_then_get_on_a_kept_alive_connection(run_server, tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"x" * 100000)
+    app = create_app()
+
+    @app.route("/file")
+    async def file(request):
+        return FileResponse(str(path))
+
+    server = run_server(app)
+    sock = server.connect()
+    sock.sendall(b"HEAD / HTTP/1.1\r\nHost: test\r\n\r\n" + REQUEST)
+    status, headers, body, rest = read_response(sock, head=True)
+    assert (status, headers["content-length"], body) == (200, "2", b"")
+    status, _, body, rest = read_response(sock, rest)
+    assert (status, body) == (200, b"ok")
+
+    sock.sendall(b"HEAD /file HTTP/1.1\r\nHost: test\r\n\r\n" + REQUEST)
+    status, headers, body, rest = read_response(sock, rest, head=True)
+    assert (status, headers["content-length"]) == (200, "100000")
+    status, _, body, rest = read_response(sock, rest)
+    assert (status, body, rest) == (200, b"ok", b"")
+    sock.close()
+
+
+class StreamingResponse(StreamHTTPResponse, HTTPResponse):
+    pass
+
+
+def test_stream_outlives_response_timeout(run_server):
+    app = Alita()
+
+    @app.route("/stream")
+    async def stream(request):
+        async def stream_fn(response):
+            for index in range(5):
+                await response.write("%d\n" % index)
+                await asyncio.sleep(0.5)
+
+        return StreamingResponse(stream_fn)
+
+    server = run_server(app, response_timeout=1, timer_resolution=0.1)
+    sock = server.connect()
+    sock.sendall(b"GET /stream HTTP/1.1\r\nHost: test\r\n\r\n")
+    data = b""
+    while not data.endswith(b"0\r\n\r\n"):
+        chunk = sock.recv(65536)
+        assert chunk, "stream cut off by the response timeout"
+        data += chunk
+    assert b"4\n" in data
+    sock.close()
+
+
+def uvloop_factory():
+    return pytest.importorskip("uvloop").new_event_loop()
+
+
+@pytest.mark.parametrize("loop_factory", [asyncio.new_event_loop, uvloop_factory])
+def test_slow_download_outlives_response_timeout(run_server, tmp_path, loop_factory):
+    size = 16 * 1024 * 1024
+    path = tmp_path / "large.bin"
+    path.write_bytes(b"x" * size)
+    app = create_app()
+
+    @app.route("/large")
+    async def large(request):
+        return FileResponse(str(path))
+
+    server = run_server(app, loop_factory=loop_factory, response_timeout=1, timer_resolution=0.1)
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
+    sock.connect(("127.0.0.1", server.port))
+    sock.settimeout(5)
+    sock.sendall(b"GET /large HTTP/1.1\r\nHost: test\r\n\r\n")
+    status, headers, _, received = read_response(sock, head=True)
+    assert (status, headers["content-length"]) == (200, str(size))
+    received = len(received)
+    started = time.time()
+    while received < size:
+        chunk = sock.recv(262144)
+        assert chunk, "download cut off after %d bytes" % received
+        received += len(chunk)
+        time.sleep(0.03)
+    assert time.time() - started > 1
+    sock.sendall(REQUEST)
+    status, _, body, _ = read_response(sock)
+    assert (status, body) == (200, b"ok")
+    sock.close()
+
+
+def test_saturated_endpoint_does_not_delay_other_endpoints(run_server):
+    app = create_app()
+
+    @app.route("/lim")
+    async def lim(request):
+        await asyncio.sleep(1)
+        return "lim"
+
+    server = run_server(app, admission_control=True, limit_concurrency=2,
+                        endpoint_limits={"lim": 1}, admission_queue_timeout=5)
+    slow = [server.connect() for _ in range(2)]
+    for sock in slow:
+        sock.sendall(b"GET /lim HTTP/1.1\r\nHost: test\r\n\r\n")
+        time.sleep(0.1)
+    sock = server.connect()
+    started = time.time()
+    sock.sendall(REQUEST)
+    status, _, body, _ = read_response(sock)
+    assert (status, body) == (200, b"ok")
+    assert time.time() - started < 0.5
+    for slow_sock in slow:
+        status, _, body, _ = read_response(slow_sock)
+        assert (status, body) == (200, b"lim")
+        slow_sock.close()
+    deadline = time.time() + 5
+    while server.state.admission.inflight and time.time() < deadline:
+        time.sleep(0.01)
+    assert server.state.admission.inflight == 0
+    sock.close()
+
+
+def test_keep_alive_timeout_follows_timer_resolution(run_server):
+    server = run_server(create_app(), timeout_keep_alive=1, timer_resolution=0.1)
+    sock = server.connect()
+    sock.sendall(REQUEST)
+    assert read_response(sock)[0] == 200
+    started = time.time()
+    assert sock.recv(1) == b""
+    assert time.time() - started < 1.5
+    sock.close()